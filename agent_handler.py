@@ -0,0 +1,152 @@
+import uuid
+import time
+import streamlit as st
+import os
+from aws_clients import get_client
+from stream_renderer import StreamRenderer
+from trace_metrics import TraceProfiler, publish_profile
+
+
+# Turn one raw completion event into ('chunk', text) / ('step', text) items
+def parse_event(event):
+    items = []
+
+    # Handle output chunks
+    if 'chunk' in event:
+        items.append(('chunk', event['chunk']['bytes'].decode('utf8')))
+
+    # Handle trace events (steps)
+    if 'trace' in event:
+        if 'trace' in event['trace']:
+            if 'orchestrationTrace' in event['trace']['trace']:
+                orch = event['trace']['trace']['orchestrationTrace']
+
+                if 'rationale' in orch:
+                    items.append(('step', orch['rationale']['text']))
+
+    return items
+
+
+class BedrockAgentHandler:
+    def __init__(self, client=None, agent_id=None, agent_alias_id=None):
+        # Shared, pooled client for this process and region
+        self.client = client or get_client('bedrock-agent-runtime')
+
+        # The supervisor agent unless another alias is given
+        self.agent_id = agent_id or os.environ.get('AGENT_ID')
+        self.agent_alias_id = agent_alias_id or os.environ.get('AGENT_ALIAS_ID')
+
+        self.session_id = str(uuid.uuid1())
+        self.start_time = None
+
+        # Final report and rationale steps of the last run, kept for the cache
+        self.report = ''
+        self.steps = []
+
+        # Timeline and token profile of the last run (see trace_metrics)
+        self.profile = None
+
+    # Invoke the agent and yield ('chunk' | 'step', text) items as they arrive.
+    # Duplicate rationale steps are dropped. Used by the UI and headless callers.
+    # Every raw event also feeds a TraceProfiler; its profile is published when
+    # the stream ends.
+    def stream(self, input_text):
+        seen_steps = set()
+        profiler = TraceProfiler(f"{int(time.time())}-{self.session_id}")
+
+        # Make API call
+        response = self.client.invoke_agent(
+            inputText=input_text,
+            agentId=self.agent_id,
+            agentAliasId=self.agent_alias_id,
+            sessionId=self.session_id,
+            enableTrace=True
+        )
+
+        # Process response stream
+        try:
+            for event in response['completion']:
+                profiler.observe(event)
+                for kind, text in parse_event(event):
+                    if kind == 'step':
+                        # Only add new steps (avoid duplicates)
+                        if text in seen_steps:
+                            continue
+                        seen_steps.add(text)
+                    yield kind, text
+        finally:
+            self.profile = profiler.finish()
+            publish_profile(self.profile)
+
+    # Run the agent without a UI and return the report, steps and timings
+    def run(self, input_text):
+        self.start_time = time.time()
+        chunks = []
+        steps = []
+        first_step = None
+        first_chunk = None
+
+        for kind, text in self.stream(input_text):
+            if kind == 'chunk':
+                if first_chunk is None:
+                    first_chunk = time.time() - self.start_time
+                chunks.append(text)
+            else:
+                if first_step is None:
+                    first_step = time.time() - self.start_time
+                steps.append(text)
+
+        self.report = ''.join(chunks)
+        self.steps = steps
+        return {
+            'report': self.report,
+            'steps': self.steps,
+            'session_id': self.session_id,
+            'time_to_first_step': first_step,
+            'time_to_first_chunk': first_chunk,
+            'elapsed_seconds': time.time() - self.start_time,
+            'profile': self.profile
+        }
+
+    # Render one ('chunk' | 'step', text) item of a run into a StreamRenderer.
+    # Steps are numbered per agent and kept in st.session_state.analysis_steps.
+    def render_event(self, renderer, kind, text, step_label='Step'):
+        if kind == 'chunk':
+            renderer.add_chunk(text)
+        else:
+            self.steps.append(text)
+            step_html = (
+                f'<div class="step-text">'
+                f'<strong>{step_label} {len(self.steps)}:</strong><br>{text}'
+                f'</div>'
+            )
+            st.session_state.analysis_steps.append(step_html)
+            renderer.add_step(step_html)
+
+        # Flush UI updates and the timer at their own throttled rates
+        renderer.tick()
+
+    # Render a run into the Streamlit placeholders. `events` lets the caller
+    # supply the ('chunk' | 'step', text) items, e.g. from a shared flight.
+    def invoke_agent(self, input_text, output_placeholder, steps_container, timer_placeholder, events=None):
+        renderer = StreamRenderer(output_placeholder, steps_container, timer_placeholder, self.start_time)
+        try:
+            self.steps = []
+
+            # Initialize empty boxes with placeholders
+            renderer.start()
+
+            if events is None:
+                events = self.stream(input_text)
+
+            for kind, text in events:
+                self.render_event(renderer, kind, text)
+
+            renderer.flush()
+            self.report = renderer.output_text
+            return True
+
+        except Exception as e:
+            renderer.flush()
+            st.error(f"Error: {str(e)}")
+            return False
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from agent_handler import BedrockAgentHandler
+
+
+# The agent alias and sessionId a report was generated in, so follow-up
+# questions can be sent to the same Bedrock session
+def session_info(handler, created_at=None):
+    return {
+        'session_id': handler.session_id,
+        'agent_id': handler.agent_id,
+        'agent_alias_id': handler.agent_alias_id,
+        'created_at': created_at or time.time()
+    }
+
+
+# A new Bedrock session for follow-ups on a report this browser session did
+# not generate itself (served from the cache, pre-warmed, or joined from
+# another session's run). The report is sent along with the first question,
+# since the agent has no conversation to answer from yet.
+def seeded_session(report, agent_id=None, agent_alias_id=None):
+    return {
+        'session_id': str(uuid.uuid1()),
+        'agent_id': agent_id or os.environ.get('AGENT_ID'),
+        'agent_alias_id': agent_alias_id or os.environ.get('AGENT_ALIAS_ID'),
+        'created_at': time.time(),
+        'report': report
+    }
+
+
+# Agent sessions that can take follow-up questions in this process. A session
+# expires after `idle_ttl_seconds` without use (keep it at or below the agent's
+# idle session TTL, after which Bedrock drops the conversation) or
+# `max_age_seconds` after the report, whichever comes first. Expired sessions
+# are evicted on access, and the least recently used beyond `max_sessions`.
+class AgentSessions:
+    def __init__(self, idle_ttl_seconds=1800, max_age_seconds=3600, max_sessions=1024, clock=time.time):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_age_seconds = max_age_seconds
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self.sessions = OrderedDict()
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def _expired(self, entry, now):
+        return (now - entry['last_used_at'] > self.idle_ttl_seconds or
+                now - entry['created_at'] > self.max_age_seconds)
+
+    def _evict(self, session_id):
+        self.sessions.pop(session_id, None)
+        self.locks.pop(session_id, None)
+
+    def evict_expired(self):
+        with self.lock:
+            now = self.clock()
+            expired = [session_id for session_id, entry in self.sessions.items() if self._expired(entry, now)]
+            for session_id in expired:
+                self._evict(session_id)
+            return len(expired)
+
+    # Track a session (see session_info and seeded_session). A session counts
+    # as idle since it was created until its first follow-up.
+    def register(self, session):
+        self.evict_expired()
+        with self.lock:
+            entry = self.sessions.get(session['session_id'])
+            if entry is None:
+                entry = dict(session, last_used_at=session['created_at'], turns=0)
+                if self._expired(entry, self.clock()):
+                    return None
+                self.sessions[entry['session_id']] = entry
+                self.locks[entry['session_id']] = threading.Lock()
+            self.sessions.move_to_end(entry['session_id'])
+            while len(self.sessions) > self.max_sessions:
+                self._evict(next(iter(self.sessions)))
+            return entry
+
+    def get(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is not None and self._expired(entry, self.clock()):
+                self._evict(session_id)
+                return None
+            return entry
+
+    # Hold a live session for one follow-up: yields its entry, or None once it
+    # has expired. Follow-ups in one session run one at a time. Only answered
+    # follow-ups count as turns, so a seeded report is sent again after a
+    # failed first question.
+    @contextmanager
+    def use(self, session_id):
+        with self.lock:
+            session_lock = self.locks.get(session_id)
+        if session_lock is None:
+            yield None
+            return
+        with session_lock:
+            entry = self.get(session_id)
+            answered = False
+            try:
+                yield entry
+                answered = True
+            finally:
+                if entry is not None:
+                    with self.lock:
+                        entry['last_used_at'] = self.clock()
+                        if answered:
+                            entry['turns'] += 1
+
+
+def follow_up_prompt(ticker, question, report=None):
+    if report:
+        return (f"Here is your analysis of ticker {ticker}:\n\n{report}\n\n"
+                f"Follow-up question about this analysis: {question}")
+    return f"Follow-up question about the analysis of ticker {ticker}: {question}"
+
+
+# Send a follow-up question to an agent session and yield ('chunk' | 'step',
+# text) items. The agent answers from the conversation it already has (or the
+# report a seeded session starts with), instead of fetching news and prices
+# again. Yields nothing when the session has expired.
+def ask_follow_up(sessions, session_id, ticker, question, client=None):
+    with sessions.use(session_id) as entry:
+        if entry is None:
+            return
+        handler = BedrockAgentHandler(client, entry['agent_id'], entry['agent_alias_id'])
+        handler.session_id = entry['session_id']
+        report = entry.get('report') if entry['turns'] == 0 else None
+        yield from handler.stream(follow_up_prompt(ticker, question, report))
+
+
+# Build the registry from AGENT_* environment variables. The idle TTL defaults
+# to the one the agents are provisioned with.
+def agent_sessions_from_env():
+    return AgentSessions(
+        idle_ttl_seconds=float(os.environ.get('AGENT_IDLE_SESSION_TTL_SECONDS', '1800')),
+        max_age_seconds=float(os.environ.get('AGENT_SESSION_MAX_AGE_SECONDS', '3600')),
+        max_sessions=int(os.environ.get('AGENT_SESSION_MAX_ENTRIES', '1024'))
+    )
@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Normalize a ticker so "aapl", " AAPL " and "AAPL" share one cache entry
+def normalize_ticker(ticker):
+    return ticker.strip().upper()
+
+
+# In-process LRU store, shared by every Streamlit session in this worker
+class MemoryBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.serve_counts = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def count_serve(self, key):
+        with self.lock:
+            self.serve_counts[key] = self.serve_counts.get(key, 0) + 1
+
+    def serve_count(self, key):
+        with self.lock:
+            return self.serve_counts.get(key, 0)
+
+
+# On-disk store so several Streamlit workers (and restarts) share results
+class SQLiteBackend:
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "key TEXT PRIMARY KEY, entry TEXT NOT NULL, last_access REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS serve_counts (key TEXT PRIMARY KEY, served INTEGER NOT NULL)"
+            )
+
+    def get(self, key):
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT entry FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE analyses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0])
+
+    def set(self, key, entry):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, entry, last_access) VALUES (?, ?, ?)",
+                (key, json.dumps(entry), time.time())
+            )
+            # Evict least recently used rows beyond the size limit
+            self.conn.execute(
+                "DELETE FROM analyses WHERE key NOT IN ("
+                "SELECT key FROM analyses ORDER BY last_access DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+
+    def count_serve(self, key):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO serve_counts (key, served) VALUES (?, 1) "
+                "ON CONFLICT(key) DO UPDATE SET served = served + 1",
+                (key,)
+            )
+
+    def serve_count(self, key):
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT served FROM serve_counts WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else 0
+
+
+# Cache of finished analyses (final report plus rationale steps) per ticker
+class AnalysisCache:
+    def __init__(self, ttl_seconds=900, max_entries=256, sqlite_path=None):
+        self.ttl_seconds = ttl_seconds
+        if sqlite_path:
+            self.backend = SQLiteBackend(sqlite_path, max_entries)
+        else:
+            self.backend = MemoryBackend(max_entries)
+
+    # Return the cached analysis if it is still inside the freshness window
+    def get(self, ticker):
+        key = normalize_ticker(ticker)
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['created_at'] > self.ttl_seconds:
+            self.backend.delete(key)
+            return None
+        return entry
+
+    # `source` is 'user' for analyses run on request and 'prewarm' for those
+    # run ahead of demand by the pre-warming scheduler
+    def put(self, ticker, report, steps, source='user'):
+        entry = {
+            'ticker': normalize_ticker(ticker),
+            'report': report,
+            'steps': list(steps),
+            'created_at': time.time(),
+            'source': source,
+            'served': 0
+        }
+        self.backend.set(entry['ticker'], entry)
+        return entry
+
+    # Count one serve of a cached entry, unless it has been replaced meanwhile.
+    # Serves of pre-warmed entries are also counted per ticker, so the count
+    # survives the entry being replaced, expired or evicted.
+    def record_served(self, entry):
+        if entry.get('source') == 'prewarm':
+            self.backend.count_serve(entry['ticker'])
+        current = self.backend.get(entry['ticker'])
+        if current is not None and current['created_at'] == entry['created_at']:
+            current['served'] = current.get('served', 0) + 1
+            self.backend.set(current['ticker'], current)
+            return current['served']
+        return None
+
+    # How often pre-warmed reports for the ticker were served
+    def prewarm_served(self, ticker):
+        return self.backend.serve_count(normalize_ticker(ticker))
+
+    # The stored entry whether or not it is still fresh
+    def peek(self, ticker):
+        return self.backend.get(normalize_ticker(ticker))
+
+    def invalidate(self, ticker):
+        self.backend.delete(normalize_ticker(ticker))
+
+
+# Build the cache from ANALYSIS_CACHE_* environment variables
+def analysis_cache_from_env():
+    return AnalysisCache(
+        ttl_seconds=float(os.environ.get('ANALYSIS_CACHE_TTL_SECONDS', '900')),
+        max_entries=int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', '256')),
+        sqlite_path=os.environ.get('ANALYSIS_CACHE_SQLITE_PATH') or None
+    )
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from agent_handler import BedrockAgentHandler
+from fake_bedrock import FakeAgentRuntimeClient, load_recording
+from single_flight import SingleFlight
+from ticker_index import check_ticker, load_ticker_index, normalize_symbol
+from trace_metrics import registry
+
+
+# Format one Server-Sent Event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Consume a blocking event iterator in a worker thread and hand the items
+# to the event loop through an asyncio queue
+def start_stream_thread(events, loop, queue, stop):
+    def worker():
+        try:
+            for kind, text in events:
+                if stop.is_set():
+                    return  # Client went away
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, text))
+            loop.call_soon_threadsafe(queue.put_nowait, ('done', None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ('error', str(e)))
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+
+# Created lazily so it binds to the server's event loop
+def analysis_semaphore(app):
+    if app.state.semaphore is None:
+        app.state.semaphore = asyncio.Semaphore(app.state.max_concurrent)
+    return app.state.semaphore
+
+
+async def analysis_events(app, ticker):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    handler = BedrockAgentHandler(client=app.state.client)
+    start = time.time()
+    chunks = []
+    step_number = 0
+
+    async with analysis_semaphore(app):
+        # Identical concurrent requests share one agent invocation
+        input_text = f"ticker {ticker}"
+        flight = app.state.single_flight.join(
+            ticker,
+            lambda: handler.stream(input_text),
+            context={'session_id': handler.session_id}
+        )
+        start_stream_thread(flight.subscribe(), loop, queue, stop)
+        yield sse_event('start', {'ticker': ticker, 'session_id': flight.context['session_id']})
+        try:
+            while True:
+                kind, text = await queue.get()
+                elapsed = round(time.time() - start, 3)
+                if kind == 'step':
+                    step_number += 1
+                    yield sse_event('step', {'step': step_number, 'text': text, 'elapsed': elapsed})
+                elif kind == 'chunk':
+                    chunks.append(text)
+                    yield sse_event('chunk', {'text': text, 'elapsed': elapsed})
+                elif kind == 'error':
+                    yield sse_event('error', {'message': text, 'elapsed': elapsed})
+                    return
+                else:
+                    yield sse_event('done', {'report': ''.join(chunks), 'steps': step_number, 'elapsed': elapsed})
+                    return
+        finally:
+            stop.set()
+
+
+async def analyze(request):
+    ticker, error, suggestions = check_ticker(request.path_params['ticker'], request.app.state.ticker_index)
+    if error:
+        return JSONResponse({'error': error, 'suggestions': suggestions}, status_code=400)
+
+    return StreamingResponse(
+        analysis_events(request.app, ticker),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# Autocomplete: listed symbols starting with ?prefix=, with their names
+async def tickers(request):
+    index = request.app.state.ticker_index
+    if index is None:
+        return JSONResponse({'error': 'Ticker index not available'}, status_code=503)
+    prefix = normalize_symbol(request.query_params.get('prefix', ''))
+    limit = min(int(request.query_params.get('limit', '10')), 50)
+    return JSONResponse({
+        'tickers': [{'symbol': symbol, 'name': index.name(symbol)} for symbol in index.complete(prefix, limit)]
+    })
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+# Prometheus scrape endpoint for per-step latency and token metrics
+async def metrics(request):
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+
+# Build the app. Pass a client (e.g. FakeAgentRuntimeClient) to run without
+# Bedrock; API_FAKE_RECORDING points the default app at a recorded stream.
+def create_app(client=None, max_concurrent=None):
+    if client is None and os.environ.get('API_FAKE_RECORDING'):
+        client = FakeAgentRuntimeClient(
+            load_recording(os.environ['API_FAKE_RECORDING']),
+            delay=float(os.environ.get('API_FAKE_DELAY', '0.05'))
+        )
+
+    app = Starlette(routes=[
+        Route('/analyze/{ticker}', analyze, methods=['POST']),
+        Route('/tickers', tickers, methods=['GET']),
+        Route('/health', health, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET'])
+    ])
+    app.state.client = client
+    app.state.max_concurrent = max_concurrent or int(os.environ.get('API_MAX_CONCURRENT_ANALYSES', '64'))
+    app.state.semaphore = None
+    app.state.single_flight = SingleFlight()
+    app.state.ticker_index = load_ticker_index()
+    return app
+
+
+if __name__ == "__main__":
+    uvicorn.run(
+        create_app(),
+        host=os.environ.get('API_HOST', '0.0.0.0'),
+        port=int(os.environ.get('API_PORT', '8080'))
+    )
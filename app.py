@@ -1,8 +1,17 @@
-import boto3
-import uuid
+import os
 import time
 import streamlit as st
-import os
+from agent_handler import BedrockAgentHandler
+from agent_sessions import agent_sessions_from_env, ask_follow_up, seeded_session, session_info
+from analysis_cache import analysis_cache_from_env, normalize_ticker
+from parallel_orchestrator import (
+    ANALYST_LANE, LANE_TITLES, RESEARCH_LANES, ParallelOrchestrator, lane_renderers, parallel_mode_available
+)
+from prewarm import prewarmer_from_env
+from session_metrics import ActiveSessions, session_publisher_from_env
+from single_flight import SingleFlight
+from ticker_index import check_ticker, load_ticker_index
+from trace_metrics import start_metrics_server
 
 # Set page config must be the first Streamlit command
 st.set_page_config(
@@ -32,100 +41,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-class BedrockAgentHandler:
-    def __init__(self):
-        # Get AWS account and region details
-        session = boto3.session.Session()
-        region = session.region_name
-        
-        self.client = boto3.client('bedrock-agent-runtime', region_name=region)
-        
-        self.agent_id = os.environ.get('AGENT_ID')
-        self.agent_alias_id = os.environ.get('AGENT_ALIAS_ID')
-        
-        self.session_id = str(uuid.uuid1())
-        self.start_time = None
-
-    def invoke_agent(self, input_text, output_placeholder, steps_container, timer_placeholder):
-        try:
-            step_number = 1
-            current_steps = []
-            
-            # Initialize empty boxes with placeholders
-            steps_container.markdown("""
-            <div class="fixed-height">
-                <div class="step-text">
-                    Activating the analysis framework...
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            output_placeholder.markdown("""
-            <div class="fixed-height">
-                <div class="step-text">
-                    Gathering the insights...
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Make API call
-            response = self.client.invoke_agent(
-                inputText=input_text,
-                agentId=self.agent_id,
-                agentAliasId=self.agent_alias_id,
-                sessionId=self.session_id,
-                enableTrace=True
-            )
-
-            # Process response stream
-            for event in response['completion']:
-                # Update timer
-                elapsed = time.time() - self.start_time
-                timer_placeholder.markdown(f"⏱️ Processing Time: {elapsed:.1f} seconds")
-                
-                # Handle output chunks
-                if 'chunk' in event:
-                    data = event['chunk']['bytes'].decode('utf8')
-                    formatted_result = f"""
-                    <div class="fixed-height">
-                        <div class="step-text">
-                            {data}
-                        </div>
-                    </div>
-                    """
-                    output_placeholder.markdown(formatted_result, unsafe_allow_html=True)
-
-                # Handle trace events (steps)
-                if 'trace' in event:
-                    if 'trace' in event['trace']:
-                        if 'orchestrationTrace' in event['trace']['trace']:
-                            orch = event['trace']['trace']['orchestrationTrace']
-                            
-                            if 'rationale' in orch:
-                                rationale_text = orch['rationale']['text']
-                                
-                                # Only add new steps (avoid duplicates)
-                                if rationale_text not in current_steps:
-                                    current_steps.append(rationale_text)
-                                    st.session_state.analysis_steps.append(
-                                        f'<div class="step-text">'
-                                        f'<strong>Step {step_number}:</strong><br>{rationale_text}'
-                                        f'</div>'
-                                    )
-                                    steps_html = f"""
-                                    <div class="fixed-height">
-                                        {''.join(st.session_state.analysis_steps)}
-                                    </div>
-                                    """
-                                    steps_container.markdown(steps_html, unsafe_allow_html=True)
-                                    step_number += 1
-
-            return True
-
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
-            return False
-
 st.title("📈 Stock Analysis Agent")
 # st.markdown("Enter your ticker symbol and press Enter to begin analysis.")
 st.markdown("""
@@ -133,74 +48,296 @@ st.markdown("""
     Enter your ticker symbol and press Enter to begin analysis.
 """)
 
-def is_valid_ticker(ticker):
-    return ticker and len(ticker) <= 5 and ticker.isalpha()
+SUPERVISOR_MODE = "Supervisor agent"
+PARALLEL_MODE = "Parallel"
+
+# Listed symbols, loaded once per process, so unknown tickers are rejected
+# before any agent is invoked
+@st.cache_resource
+def get_ticker_index():
+    return load_ticker_index()
+
+# Fill the ticker input with a suggested symbol
+def use_suggestion(symbol):
+    st.session_state.ticker_input = symbol
+
+# One analysis cache per process, shared by every browser session
+@st.cache_resource
+def get_analysis_cache():
+    return analysis_cache_from_env()
+
+# Serve per-step latency and token metrics on METRICS_PORT, if configured
+@st.cache_resource
+def get_metrics_server():
+    port = os.environ.get('METRICS_PORT')
+    return start_metrics_server(int(port)) if port else None
+
+get_metrics_server()
+
+# Sessions streaming an analysis in this process, published to CloudWatch for
+# autoscaling when SESSION_METRICS_NAMESPACE is set
+@st.cache_resource
+def get_active_sessions():
+    sessions = ActiveSessions()
+    session_publisher_from_env(sessions)
+    return sessions
+
+# In-flight runs per ticker, so concurrent sessions share one agent invocation
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
+
+# Pre-warm the cache for the PREWARM_TICKERS hot list in the background, if set
+@st.cache_resource
+def get_prewarmer():
+    prewarmer = prewarmer_from_env(get_analysis_cache(), get_single_flight())
+    return prewarmer.start() if prewarmer else None
+
+get_prewarmer()
+
+# Agent sessions that can still take follow-up questions, evicted when they expire
+@st.cache_resource
+def get_agent_sessions():
+    return agent_sessions_from_env()
+
+# Create the steps and results panes, showing their waiting state
+def create_analysis_panes():
+    col1, col2 = st.columns([1, 1])
+
+    with col1:
+        st.markdown("### Analysis Steps")
+        steps_container = st.empty()
+        # Initialize empty box
+        steps_container.markdown("""
+        <div class="fixed-height">
+            <div class="step-text">
+                Waiting for analysis to begin...
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown("### Results")
+        output_placeholder = st.empty()
+        # Initialize empty box
+        output_placeholder.markdown("""
+        <div class="fixed-height">
+            <div class="step-text">
+                Waiting for results...
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    return steps_container, output_placeholder
+
+# Remember the analysis shown in this browser session, so it stays on screen
+# while follow-up questions are asked about it. `session` is the agent session
+# this browser session ran the analysis in; reports it did not run itself get
+# a private session seeded with the report, so no Bedrock conversation is
+# shared between browser sessions.
+def set_last_analysis(entry, session=None):
+    st.session_state['last_analysis'] = entry
+    st.session_state['follow_ups'] = []
+    st.session_state['follow_up_session'] = None
+    if entry:
+        st.session_state['follow_up_session'] = session or seeded_session(entry['report'])
+        get_agent_sessions().register(st.session_state['follow_up_session'])
+
+# Render a finished analysis served from the cache
+def render_cached_analysis(entry, output_placeholder, steps_container, timer_placeholder):
+    st.session_state.analysis_steps = [
+        f'<div class="step-text">'
+        f'<strong>Step {step_number}:</strong><br>{rationale_text}'
+        f'</div>'
+        for step_number, rationale_text in enumerate(entry['steps'], start=1)
+    ]
+    steps_container.markdown(f"""
+    <div class="fixed-height">
+        {''.join(st.session_state.analysis_steps)}
+    </div>
+    """, unsafe_allow_html=True)
+    output_placeholder.markdown(f"""
+    <div class="fixed-height">
+        <div class="step-text">
+            {entry['report']}
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    age = time.time() - entry['created_at']
+    produced_at = time.strftime('%H:%M:%S', time.localtime(entry['created_at']))
+    kind = "Pre-warmed analysis" if entry.get('source') == 'prewarm' else "Served from cache: analysis"
+    timer_placeholder.markdown(f"⏱️ {kind} from {produced_at} ({age:.0f} seconds old)")
 
 # Initialize session state for analysis steps
 if 'analysis_steps' not in st.session_state:
     st.session_state.analysis_steps = []
 
 ticker = st.text_input("Stock Ticker", key="ticker_input")
+force_refresh = st.button("Force refresh", help="Ignore any cached analysis and run the agents again")
+
+# Parallel mode calls the collaborator aliases directly when they are configured
+orchestration = SUPERVISOR_MODE
+if parallel_mode_available():
+    orchestration = st.radio(
+        "Orchestration",
+        [SUPERVISOR_MODE, PARALLEL_MODE],
+        horizontal=True,
+        help="Parallel runs the news and stock data agents concurrently, then the analyst agent"
+    )
 
 # Create a container for the success message
 success_container = st.empty()
 
-if ticker and ticker != st.session_state.get('last_analyzed_ticker', ''):
+if ticker and (force_refresh or ticker != st.session_state.get('last_analyzed_ticker', '')):
     # Clear success message from previous analysis
     success_container.empty()
     
-    if not is_valid_ticker(ticker):
-        st.error("Invalid ticker symbol. Please enter 1-5 letters only.")
+    set_last_analysis(None)
+    ticker_index = get_ticker_index()
+    symbol, error, suggestions = check_ticker(ticker, ticker_index)
+    if error:
+        st.error(error)
+        if suggestions:
+            st.markdown("Did you mean:")
+            for suggestion_column, suggestion in zip(st.columns(len(suggestions)), suggestions):
+                with suggestion_column:
+                    st.button(f"{suggestion} · {ticker_index.name(suggestion)}", key=f"suggestion_{suggestion}",
+                              on_click=use_suggestion, args=(suggestion,))
     else:
         # Clear previous analysis steps
         st.session_state.analysis_steps = []
         st.session_state['last_analyzed_ticker'] = ticker
+        ticker = symbol
         
         # Create containers for spinner and timer
         spinner_row = st.empty()
         timer_placeholder = st.empty()
         
+        # In parallel mode the news and stock data agents get a lane each
+        lane_placeholders = {}
+        if orchestration == PARALLEL_MODE:
+            for lane_column, lane in zip(st.columns(2), RESEARCH_LANES):
+                with lane_column:
+                    st.markdown(f"### {LANE_TITLES[lane]}")
+                    lane_steps = st.empty()
+                    lane_placeholders[lane] = (st.empty(), lane_steps)
+
         # Create columns for headers and content
-        col1, col2 = st.columns([1, 1])
-        
-        with col1:
-            st.markdown("### Analysis Steps")
-            steps_container = st.empty()
-            # Initialize empty box
-            steps_container.markdown("""
-            <div class="fixed-height">
-                <div class="step-text">
-                    Waiting for analysis to begin...
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-        with col2:
-            st.markdown("### Results")
-            output_placeholder = st.empty()
-            # Initialize empty box
-            output_placeholder.markdown("""
-            <div class="fixed-height">
-                <div class="step-text">
-                    Waiting for results...
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        steps_container, output_placeholder = create_analysis_panes()
 
-        handler = BedrockAgentHandler()
-        handler.start_time = time.time()  # Set start time
-        
-        # Use the spinner container above both columns
-        with spinner_row:
-            with st.spinner('Decoding the market pulse...'):
-                success = handler.invoke_agent(
-                    f"ticker {ticker}",
-                    output_placeholder,
-                    steps_container,
-                    timer_placeholder
-                )
-                
-                if success:
-                    final_time = time.time() - handler.start_time
-                    timer_placeholder.markdown(f"⏱️ Total Processing Time: {final_time:.1f} seconds")
-                    success_container.success("✅ Stock Insights ready!")
\ No newline at end of file
+        analysis_cache = get_analysis_cache()
+        cached = None if force_refresh else analysis_cache.get(ticker)
+
+        if cached:
+            render_cached_analysis(cached, output_placeholder, steps_container, timer_placeholder)
+            analysis_cache.record_served(cached)
+            set_last_analysis(cached)
+            success_container.success("✅ Stock Insights ready!")
+        elif orchestration == PARALLEL_MODE:
+            orchestrator = ParallelOrchestrator()
+            orchestrator.start_time = time.time()
+
+            # Join the parallel run already in progress for this ticker, or lead a new one
+            analyst_session = orchestrator.analyst_session()
+            flight = get_single_flight().join(
+                f"parallel:{normalize_ticker(ticker)}",
+                lambda: orchestrator.stream(normalize_ticker(ticker)),
+                context={'session_id': analyst_session['session_id']}
+            )
+            led = flight.context['session_id'] == analyst_session['session_id']
+            lane_placeholders[ANALYST_LANE] = (output_placeholder, steps_container)
+
+            with spinner_row, get_active_sessions().track():
+                with st.spinner('Researching news and price data in parallel...'):
+                    success = orchestrator.invoke(
+                        ticker,
+                        lane_renderers(lane_placeholders, timer_placeholder, orchestrator.start_time),
+                        events=flight.subscribe()
+                    )
+
+                    if success:
+                        final_time = time.time() - orchestrator.start_time
+                        timer_placeholder.markdown(f"⏱️ Total Processing Time: {final_time:.1f} seconds")
+                        success_container.success("✅ Stock Insights ready!")
+                        if orchestrator.report:
+                            set_last_analysis(
+                                analysis_cache.put(ticker, orchestrator.report, orchestrator.steps),
+                                analyst_session if led else None
+                            )
+        else:
+            handler = BedrockAgentHandler()
+            handler.start_time = time.time()  # Set start time
+            input_text = f"ticker {ticker}"
+
+            # Join the run already in progress for this ticker, or lead a new one
+            flight = get_single_flight().join(
+                normalize_ticker(ticker),
+                lambda: handler.stream(input_text),
+                context={'session_id': handler.session_id}
+            )
+            led = flight.context['session_id'] == handler.session_id
+
+            # Use the spinner container above both columns
+            with spinner_row, get_active_sessions().track():
+                with st.spinner('Decoding the market pulse...'):
+                    success = handler.invoke_agent(
+                        input_text,
+                        output_placeholder,
+                        steps_container,
+                        timer_placeholder,
+                        events=flight.subscribe()
+                    )
+
+                    if success:
+                        final_time = time.time() - handler.start_time
+                        timer_placeholder.markdown(f"⏱️ Total Processing Time: {final_time:.1f} seconds")
+                        success_container.success("✅ Stock Insights ready!")
+                        if handler.report:
+                            set_last_analysis(
+                                analysis_cache.put(ticker, handler.report, handler.steps),
+                                session_info(handler, handler.start_time) if led else None
+                            )
+elif ticker and st.session_state.get('last_analysis'):
+    # Rerun for a follow-up question: keep showing the analysis it is about
+    timer_placeholder = st.empty()
+    steps_container, output_placeholder = create_analysis_panes()
+    render_cached_analysis(st.session_state['last_analysis'], output_placeholder, steps_container, timer_placeholder)
+
+# Follow-up questions go to this browser session's agent session, so the agent
+# answers from the context it already has instead of a full re-run
+last_analysis = st.session_state.get('last_analysis')
+follow_up_session = st.session_state.get('follow_up_session')
+if ticker and last_analysis and follow_up_session:
+    st.markdown("### Follow-up Questions")
+    for question, answer in st.session_state.get('follow_ups', []):
+        st.markdown(f"**{question}**")
+        st.markdown(answer)
+    new_answer = st.container()
+
+    session = get_agent_sessions().register(follow_up_session)
+    if session is None:
+        st.info("The agent session for this analysis has expired. Use \"Force refresh\" to run the analysis again before asking follow-up questions.")
+    else:
+        with st.form('follow_up', clear_on_submit=True):
+            question = st.text_input("Ask about this analysis", placeholder="What about the dividend?")
+            asked = st.form_submit_button("Ask")
+
+        if asked and question.strip():
+            with new_answer:
+                st.markdown(f"**{question}**")
+                answer_placeholder = st.empty()
+                follow_up_timer = st.empty()
+                chunks = []
+                start_time = time.time()
+                try:
+                    with get_active_sessions().track(), st.spinner('Asking the agent...'):
+                        for kind, text in ask_follow_up(get_agent_sessions(), session['session_id'], last_analysis['ticker'], question):
+                            if kind == 'chunk':
+                                chunks.append(text)
+                                answer_placeholder.markdown(''.join(chunks))
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+
+                if chunks:
+                    follow_up_timer.markdown(f"⏱️ Answered in {time.time() - start_time:.1f} seconds")
+                    st.session_state['follow_ups'].append((question, ''.join(chunks)))
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+# One client per (service, region) for the whole process. boto3 clients are
+# thread-safe, so every Streamlit session and worker thread can share them.
+_clients = {}
+_lock = threading.Lock()
+_default_region = None
+_stats = {
+    'client_creations': 0,
+    'client_reuses': 0
+}
+
+
+# Client settings, overridable through AWS_CLIENT_* environment variables
+def client_config():
+    return Config(
+        max_pool_connections=int(os.environ.get('AWS_CLIENT_MAX_POOL_CONNECTIONS', '50')),
+        connect_timeout=float(os.environ.get('AWS_CLIENT_CONNECT_TIMEOUT', '5')),
+        read_timeout=float(os.environ.get('AWS_CLIENT_READ_TIMEOUT', '120')),
+        tcp_keepalive=True,
+        retries={
+            'mode': 'adaptive',
+            'max_attempts': int(os.environ.get('AWS_CLIENT_MAX_ATTEMPTS', '5'))
+        }
+    )
+
+
+def default_region():
+    global _default_region
+    if _default_region is None:
+        _default_region = boto3.session.Session().region_name
+    return _default_region
+
+
+# Return the shared client for a service, creating it on first use
+def get_client(service_name, region_name=None):
+    region = region_name or default_region()
+    key = (service_name, region)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _stats['client_reuses'] += 1
+            return client
+        # boto3.client() uses the shared default session, which is not
+        # thread-safe, so each client gets its own session
+        client = boto3.session.Session().client(
+            service_name,
+            region_name=region,
+            config=client_config()
+        )
+        _clients[key] = client
+        _stats['client_creations'] += 1
+        return client
+
+
+# Count HTTP connections opened vs. requests sent across all pooled clients.
+# Relies on botocore/urllib3 internals, so missing attributes are skipped.
+def _connection_stats():
+    connections_opened = 0
+    requests_sent = 0
+    with _lock:
+        clients = list(_clients.values())
+    for client in clients:
+        http_session = getattr(getattr(client, '_endpoint', None), 'http_session', None)
+        manager = getattr(http_session, '_manager', None)
+        pools = getattr(manager, 'pools', None)
+        if pools is None:
+            continue
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            connections_opened += getattr(pool, 'num_connections', 0)
+            requests_sent += getattr(pool, 'num_requests', 0)
+    return connections_opened, requests_sent
+
+
+# Snapshot of the factory counters
+def client_stats():
+    connections_opened, requests_sent = _connection_stats()
+    with _lock:
+        stats = dict(_stats)
+        stats['active_clients'] = len(_clients)
+    stats['connections_opened'] = connections_opened
+    stats['requests_sent'] = requests_sent
+    stats['connection_reuses'] = max(requests_sent - connections_opened, 0)
+    return stats
@@ -0,0 +1,154 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from agent_handler import BedrockAgentHandler
+from analysis_cache import normalize_ticker
+
+# Error codes that mean "slow down" rather than "this ticker failed", compared
+# case-insensitively: API errors use ThrottlingException, errors raised mid-stream
+# (EventStreamError) use the event names, e.g. throttlingException
+THROTTLING_ERROR_CODES = {
+    'throttlingexception',
+    'toomanyrequestsexception',
+    'servicequotaexceededexception',
+    'serviceunavailableexception'
+}
+
+
+# Read tickers from a file (or "-" for stdin): one per line or comma separated,
+# "#" starts a comment. Duplicates are dropped, order is kept.
+def read_tickers(path):
+    source = sys.stdin if path == '-' else open(path)
+    tickers = []
+    seen = set()
+    with source:
+        for line in source:
+            for item in line.split('#', 1)[0].split(','):
+                ticker = normalize_ticker(item)
+                if ticker and ticker not in seen:
+                    seen.add(ticker)
+                    tickers.append(ticker)
+    return tickers
+
+
+# Tickers that already have a successful record in the output file
+def completed_tickers(output_path):
+    done = set()
+    try:
+        with open(output_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written line from an interrupted run
+                if record.get('status') == 'ok':
+                    done.add(record['ticker'])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def is_throttling_error(error):
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code', '').lower() in THROTTLING_ERROR_CODES
+    return False
+
+
+def utc_timestamp(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat()
+
+
+# Analyze one ticker, backing off with full jitter while Bedrock throttles us
+def analyze_ticker(ticker, max_attempts, base_delay, max_delay):
+    started_at = time.time()
+    attempt = 0
+    while True:
+        attempt += 1
+        handler = BedrockAgentHandler()
+        try:
+            result = handler.run(f"ticker {ticker}")
+            status, error = 'ok', None
+            break
+        except Exception as e:
+            if is_throttling_error(e) and attempt < max_attempts:
+                time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+                continue
+            result = {}
+            status, error = 'error', str(e)
+            break
+
+    finished_at = time.time()
+    return {
+        'ticker': ticker,
+        'status': status,
+        'error': error,
+        'report': result.get('report'),
+        'steps': result.get('steps', []),
+        'session_id': result.get('session_id'),
+        'attempts': attempt,
+        'started_at': utc_timestamp(started_at),
+        'finished_at': utc_timestamp(finished_at),
+        'total_seconds': round(finished_at - started_at, 3),
+        'agent_seconds': result.get('elapsed_seconds'),
+        'time_to_first_step': result.get('time_to_first_step'),
+        'time_to_first_chunk': result.get('time_to_first_chunk'),
+        'profile': result.get('profile')
+    }
+
+
+def run_batch(tickers, output_path, concurrency, max_attempts, base_delay, max_delay):
+    write_lock = threading.Lock()
+    counts = {'ok': 0, 'error': 0}
+
+    with open(output_path, 'a') as output, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(analyze_ticker, ticker, max_attempts, base_delay, max_delay): ticker
+            for ticker in tickers
+        }
+        for future in as_completed(futures):
+            record = future.result()
+            # One flushed line per ticker, so an interrupted run can resume
+            with write_lock:
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+            counts[record['status']] += 1
+            print(f"[{counts['ok'] + counts['error']}/{len(tickers)}] {record['ticker']}: "
+                  f"{record['status']} in {record['total_seconds']:.1f}s", file=sys.stderr)
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a watchlist of tickers with the Bedrock supervisor agent.")
+    parser.add_argument('watchlist', help="File with tickers (one per line or comma separated), or - for stdin")
+    parser.add_argument('-o', '--output', default='reports.jsonl', help="JSONL file that reports are appended to")
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="Maximum concurrent agent invocations")
+    parser.add_argument('--max-attempts', type=int, default=6, help="Attempts per ticker when throttled")
+    parser.add_argument('--base-delay', type=float, default=1.0, help="Initial backoff delay in seconds")
+    parser.add_argument('--max-delay', type=float, default=60.0, help="Maximum backoff delay in seconds")
+    parser.add_argument('--no-resume', action='store_true', help="Re-run tickers already reported in the output file")
+    args = parser.parse_args()
+
+    tickers = read_tickers(args.watchlist)
+    if not args.no_resume:
+        done = completed_tickers(args.output)
+        if done:
+            print(f"Resuming: skipping {len(done & set(tickers))} tickers already in {args.output}", file=sys.stderr)
+        tickers = [ticker for ticker in tickers if ticker not in done]
+
+    start = time.time()
+    counts = run_batch(tickers, args.output, args.concurrency, args.max_attempts, args.base_delay, args.max_delay)
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed in {time.time() - start:.1f}s", file=sys.stderr)
+    return 1 if counts['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
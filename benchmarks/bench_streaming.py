@@ -0,0 +1,203 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+# Run from anywhere: the modules under test live in the repository root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import streamlit as st  # noqa: E402
+
+from agent_handler import BedrockAgentHandler  # noqa: E402
+from fake_bedrock import FakeAgentRuntimeClient, load_recording  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# Allowed slowdown against the baseline: value <= baseline * (1 + ratio) + slack
+TOLERANCES = {
+    'time_to_first_step': (0.5, 0.02),
+    'time_to_first_chunk': (0.5, 0.02),
+    'end_to_end_seconds': (0.5, 0.05),
+    'handler_seconds_per_event': (1.0, 0.0002),
+    'render_calls': (0.1, 0),
+    'rendered_bytes': (0.1, 0),
+    'session_state_bytes': (0.1, 0)
+}
+
+
+# Stand-in for st.empty()/st.container(): counts the markdown() calls and the
+# bytes that would go over the websocket
+class BenchPlaceholder:
+    def __init__(self, stats, pane):
+        self.stats = stats
+        self.pane = pane
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.stats['render_calls'] += 1
+        self.stats['rendered_bytes'] += len(body.encode('utf8'))
+        # First render of a step / of output text, i.e. when the user sees it
+        first_key = None
+        if self.pane == 'steps' and 'Step ' in body:
+            first_key = 'first_step_at'
+        elif self.pane == 'output' and 'Gathering the insights' not in body:
+            first_key = 'first_chunk_at'
+        if first_key and self.stats[first_key] is None:
+            self.stats[first_key] = time.perf_counter()
+
+    def container(self, height=None, border=None):
+        return self
+
+
+# FakeAgentRuntimeClient whose completion stream records the time spent
+# producing events (the paced waits of the replay), so that it can be taken out
+# of the time spent in invoke_agent
+class TimedAgentRuntimeClient(FakeAgentRuntimeClient):
+    def __init__(self, stats, events, delay=0.0, time_scale=None):
+        super().__init__(events, delay=delay, time_scale=time_scale)
+        self.stats = stats
+
+    def invoke_agent(self, **kwargs):
+        response = super().invoke_agent(**kwargs)
+        response['completion'] = self._timed(response['completion'])
+        return response
+
+    def _timed(self, completion):
+        while True:
+            start = time.perf_counter()
+            try:
+                event = next(completion)
+            except StopIteration:
+                return
+            finally:
+                self.stats['stream_seconds'] += time.perf_counter() - start
+            yield event
+
+
+# A long synthetic run to expose per-event costs that grow with stream length
+def synthetic_events(steps=400, chunks=1500):
+    events = []
+    for i in range(steps):
+        events.append({'trace': {'trace': {'orchestrationTrace': {
+            'rationale': {'traceId': f'synthetic-{i}', 'text': f'Synthetic reasoning step {i} ' + 'x' * 200}
+        }}}})
+        for _ in range(chunks // steps):
+            events.append({'chunk': {'bytes': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. '}})
+    return events
+
+
+def session_state_bytes():
+    steps = st.session_state.analysis_steps
+    return sys.getsizeof(steps) + sum(sys.getsizeof(step) for step in steps)
+
+
+# Replay one recorded stream through BedrockAgentHandler.invoke_agent
+def run_scenario(events, delay=0.0, time_scale=None):
+    stats = {'render_calls': 0, 'rendered_bytes': 0, 'stream_seconds': 0.0,
+             'first_step_at': None, 'first_chunk_at': None}
+    client = TimedAgentRuntimeClient(stats, events, delay=delay, time_scale=time_scale)
+    handler = BedrockAgentHandler(client=client)
+
+    st.session_state.analysis_steps = []
+    state_before = session_state_bytes()
+
+    start = time.perf_counter()
+    handler.start_time = time.time()
+    success = handler.invoke_agent(
+        'ticker BENCH',
+        BenchPlaceholder(stats, 'output'),
+        BenchPlaceholder(stats, 'steps'),
+        BenchPlaceholder(stats, 'timer')
+    )
+    end = time.perf_counter()
+    if not success:
+        raise RuntimeError('invoke_agent failed during benchmark replay')
+
+    def since_start(mark):
+        return round(mark - start, 4) if mark is not None else None
+
+    return {
+        'events': len(events),
+        'time_to_first_step': since_start(stats['first_step_at']),
+        'time_to_first_chunk': since_start(stats['first_chunk_at']),
+        'end_to_end_seconds': round(end - start, 4),
+        # Parsing, profiling and rendering in invoke_agent, without the replay
+        'handler_seconds_per_event': round((end - start - stats['stream_seconds']) / len(events), 7),
+        'render_calls': stats['render_calls'],
+        'rendered_bytes': stats['rendered_bytes'],
+        'session_state_bytes': session_state_bytes() - state_before
+    }
+
+
+def scenarios():
+    recording = load_recording(os.path.join(ROOT, 'recordings', 'AAPL.json'))
+    return {
+        # Recorded run replayed at 1/100th of its original pace
+        'recorded_aapl': lambda: run_scenario(recording, time_scale=0.01),
+        # Same run with no waiting: pure parsing and rendering overhead
+        'recorded_aapl_burst': lambda: run_scenario(recording),
+        'synthetic_long_stream': lambda: run_scenario(synthetic_events())
+    }
+
+
+# Metrics that got worse than the baseline allows
+def regressions(name, result, baseline):
+    found = []
+    for metric, (ratio, slack) in TOLERANCES.items():
+        expected = baseline.get(metric)
+        actual = result.get(metric)
+        if expected is None or actual is None:
+            continue
+        if actual > expected * (1 + ratio) + slack:
+            found.append(f"{name}.{metric}: {actual} > baseline {expected}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the agent streaming and rendering path.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per scenario; the median is reported")
+    parser.add_argument('--check', action='store_true', help="Exit non-zero if a metric regressed against baselines.json")
+    parser.add_argument('--update-baselines', action='store_true', help="Write the results to baselines.json")
+    args = parser.parse_args()
+
+    # Bare-mode session_state access logs a warning per call
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    results = {}
+    for name, scenario in scenarios().items():
+        runs = [scenario() for _ in range(args.repeat)]
+        median = {}
+        for metric in runs[0]:
+            values = sorted(run[metric] for run in runs if run[metric] is not None)
+            median[metric] = values[len(values) // 2] if values else None
+        results[name] = median
+
+    print(json.dumps(results, indent=2))
+
+    if args.update_baselines:
+        with open(BASELINES_PATH, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        return 0
+
+    if args.check:
+        with open(BASELINES_PATH) as f:
+            baselines = json.load(f)
+        found = []
+        for name, result in results.items():
+            found.extend(regressions(name, result, baselines.get(name, {})))
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if found else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
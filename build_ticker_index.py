@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import urllib.request
+
+from ticker_index import TICKER_INDEX_PATH, is_ticker_format, normalize_symbol, read_ticker_index
+
+# Nasdaq Trader symbol directory: every Nasdaq listing, and the NYSE, NYSE
+# American, NYSE Arca and Cboe listings
+DEFAULT_SOURCES = [
+    'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt',
+    'https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt'
+]
+
+# The directory lists over 10,000 symbols; far fewer means a truncated or
+# failed download
+MIN_SYMBOLS = 1000
+
+
+def read_source(source):
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=30) as response:
+            return response.read().decode('utf8', errors='replace')
+    with open(source) as f:
+        return f.read()
+
+
+# (symbol, name) rows of a pipe-delimited listing file. Test issues and
+# symbols other than plain and class shares (preferreds, rights) are skipped.
+def parse_listing(text):
+    lines = [line for line in text.splitlines() if line and not line.startswith('File Creation Time')]
+    header = lines[0].split('|')
+    symbol_column = header.index('ACT Symbol') if 'ACT Symbol' in header else header.index('Symbol')
+    name_column = header.index('Security Name')
+    test_column = header.index('Test Issue') if 'Test Issue' in header else None
+
+    rows = []
+    for line in lines[1:]:
+        fields = line.split('|')
+        if test_column is not None and fields[test_column] == 'Y':
+            continue
+        symbol = normalize_symbol(fields[symbol_column])
+        if is_ticker_format(symbol):
+            # "Apple Inc. - Common Stock" -> "Apple Inc."
+            rows.append((symbol, fields[name_column].split(' - ')[0].strip()))
+    return rows
+
+
+def build_index(sources):
+    names = {}
+    for source in sources:
+        for symbol, name in parse_listing(read_source(source)):
+            names.setdefault(symbol, name)
+    return sorted(names.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the ticker index used to validate symbols before invoking the agents.")
+    parser.add_argument('sources', nargs='*', default=DEFAULT_SOURCES,
+                        help="Pipe-delimited listing files or URLs (default: the Nasdaq Trader symbol directory)")
+    parser.add_argument('-o', '--output', default=TICKER_INDEX_PATH, help="Index file to write")
+    parser.add_argument('--min-symbols', type=int, default=MIN_SYMBOLS,
+                        help="Fail when the index has fewer symbols than this")
+    parser.add_argument('--check', action='store_true',
+                        help="Only check that the index file exists and has enough symbols")
+    args = parser.parse_args()
+
+    if args.check:
+        try:
+            count = len(read_ticker_index(args.output))
+        except FileNotFoundError:
+            print(f"Ticker index {args.output} not found", file=sys.stderr)
+            return 1
+        if count < args.min_symbols:
+            print(f"Ticker index {args.output} has {count} symbols, expected at least {args.min_symbols}", file=sys.stderr)
+            return 1
+        print(f"Ticker index {args.output} has {count} symbols")
+        return 0
+
+    rows = build_index(args.sources)
+    if len(rows) < args.min_symbols:
+        print(f"Found {len(rows)} symbols in the listing files, expected at least {args.min_symbols}", file=sys.stderr)
+        return 1
+
+    with open(args.output + '.tmp', 'w') as f:
+        for symbol, name in rows:
+            f.write(f"{symbol}\t{name}\n")
+    os.replace(args.output + '.tmp', args.output)
+    print(f"Wrote {len(rows)} symbols to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,70 +6,60 @@ from aws_cdk import (
     aws_logs as logs,
     aws_ecr_assets as ecr_assets,
     aws_elasticloadbalancingv2 as elbv2,
+    aws_cloudwatch as cloudwatch,
     CfnOutput,
+    Duration,
     RemovalPolicy
 )
 from constructs import Construct
 import subprocess
 import os
-import json
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from create_bedrock_agents import COLLABORATOR_ENV_PREFIXES, load_manifest
+
+# Custom metric published by the app (see session_metrics.py) for autoscaling
+SESSION_METRICS_NAMESPACE = "StockAnalysisAgent"
+SESSION_METRICS_SERVICE = "stock-analysis-app"
+
+# Port of the streaming HTTP API (api_server.py)
+API_PORT = 8080
 
 class AppStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
-        # Path to the Python script
+        # Agents are provisioned by create_bedrock_agents.py as a separate step,
+        # which writes a manifest keyed on the agent definitions. Synth only reads
+        # the manifest for the current definitions; with -c provision_agents=true
+        # it runs the provisioning step first when there is none.
         python_file_path = os.path.join(os.path.dirname(__file__), "../create_bedrock_agents.py")
-        role_arn = "arn:aws:iam::680038756295:role/admin"
-
-        try:
-            # Execute the Python script and pass the role_arn parameter
-            result = subprocess.run(
-                ["python3", python_file_path, role_arn],
-                capture_output=True,
-                text=True,
-                check=True,
+        role_arn = self.node.try_get_context("agent_role_arn") or "arn:aws:iam::680038756295:role/admin"
+
+        manifest = load_manifest(role_arn)
+        if manifest is None and str(self.node.try_get_context("provision_agents")).lower() == "true":
+            subprocess.run(["python3", python_file_path, role_arn], check=True)
+            manifest = load_manifest(role_arn)
+
+        if manifest is None:
+            raise ValueError(
+                "No agent manifest matches the current agent definitions. Provision the agents first with "
+                f"`python create_bedrock_agents.py {role_arn}`, or pass -c provision_agents=true."
             )
-            try:
-                start_index = result.stdout.find("{\"final_supervisor_agent_id")
-                
-                if start_index == -1:
-                    raise ValueError("The expected JSON key 'final_supervisor_agent_id' was not found in the output.")
-                
-                # Try to find the last closing brace for the JSON string
-                end_index = result.stdout.rfind("}") + 1  # +1 to include the closing brace
-
-                # Extract the JSON string
-                json_str = result.stdout[start_index:end_index].strip()
-                
-                print("Extracted JSON string:")
-                print(json_str)
-                
-                # Parse the JSON string
-                output = json.loads(json_str)
-
-                # Extract values from the parsed JSON
-                agent_id = output.get("final_supervisor_agent_id")
-                agent_alias_id = output.get("final_supervisor_agent_alias")
-                
-                print(f"Agent ID: {agent_id}, Agent Alias: {agent_alias_id}")
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON. Error: {e}")
-                print(f"Raw output: {result.stdout.strip()}")
-                raise
-            except ValueError as ve:
-                print(f"ValueError: {ve}")
-                raise
-
-
-            if not agent_id or not agent_alias_id:
-                raise ValueError("The Python script did not return agent_id or agent_alias")
-
-            print(f"Agent ID: {agent_id}, Agent Alias: {agent_alias_id}")
-
-        except subprocess.CalledProcessError as e:
-            print("Error executing Python file!")
-            print(f"Error: {e.stderr.strip()}")
+
+        agent_id = manifest["final_supervisor_agent_id"]
+        agent_alias_id = manifest["final_supervisor_agent_alias"]
+
+        # Collaborator aliases, for the app's parallel orchestration mode
+        collaborator_environment = {}
+        for agent_name, prefix in COLLABORATOR_ENV_PREFIXES.items():
+            collaborator = manifest.get("agents", {}).get(agent_name)
+            if collaborator:
+                collaborator_environment[f"{prefix}_AGENT_ID"] = collaborator["agent_id"]
+                collaborator_environment[f"{prefix}_AGENT_ALIAS_ID"] = collaborator["agent_alias_id"]
+        print(f"Agent ID: {agent_id}, Agent Alias: {agent_alias_id} (manifest {manifest['key'][:12]})")
 
         # Get the Docker context directory
         docker_context_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -78,7 +68,7 @@ class AppStack(Stack):
         docker_image_asset = ecr_assets.DockerImageAsset(self, "MyDockerImage",
             directory=docker_context_path,
             platform=ecr_assets.Platform.LINUX_AMD64,
-            exclude=["cdk", "cdk.out", ".git", "__pycache__", "*.pyc"]
+            exclude=["cdk", "cdk.out", ".git", "__pycache__", "*.pyc", "agent_manifests"]
         )
 
         # Create VPC
@@ -120,6 +110,17 @@ class AppStack(Stack):
             ec2.Port.tcp(8501)
         )
 
+        # Streaming HTTP API (api_server.py)
+        alb_security_group.add_ingress_rule(
+            ec2.Peer.any_ipv4(),
+            ec2.Port.tcp(API_PORT)
+        )
+
+        service_security_group.add_ingress_rule(
+            alb_security_group,
+            ec2.Port.tcp(API_PORT)
+        )
+
         # Create ECS Cluster
         cluster = ecs.Cluster(self, "MyCluster", 
             vpc=vpc,
@@ -136,14 +137,35 @@ class AppStack(Stack):
             ]
         )
 
-        # Define the ECS Fargate Task Definition
+        # Let the app publish its active session count
+        task_role.add_to_policy(iam.PolicyStatement(
+            actions=["cloudwatch:PutMetricData"],
+            resources=["*"],
+            conditions={"StringEquals": {"cloudwatch:namespace": SESSION_METRICS_NAMESPACE}}
+        ))
+
+        # Define the ECS Fargate Task Definition. Every Streamlit session reruns
+        # its script and renders its agent stream in this one process, so tasks
+        # get a full vCPU and scale out on session count rather than growing.
         task_definition = ecs.FargateTaskDefinition(
             self, 
             "MyTaskDef",
             task_role=task_role,
             execution_role=task_role,
-            cpu=512,
-            memory_limit_mib=1024
+            cpu=1024,
+            memory_limit_mib=2048
+        )
+
+        agent_environment = {
+            "AGENT_ID": agent_id,
+            "AGENT_ALIAS_ID": agent_alias_id,
+            **collaborator_environment
+        }
+        log_group = logs.LogGroup(
+            self,
+            "MyLogGroup",
+            retention=logs.RetentionDays.ONE_WEEK,
+            removal_policy=RemovalPolicy.DESTROY
         )
 
         # Add container with logging
@@ -151,16 +173,13 @@ class AppStack(Stack):
             image=ecs.ContainerImage.from_docker_image_asset(docker_image_asset),
             logging=ecs.LogDrivers.aws_logs(
                 stream_prefix="app",
-                log_group=logs.LogGroup(
-                    self,
-                    "MyLogGroup",
-                    retention=logs.RetentionDays.ONE_WEEK,
-                    removal_policy=RemovalPolicy.DESTROY
-                )
+                log_group=log_group
             ),
             environment={
-                "AGENT_ID": agent_id,
-                "AGENT_ALIAS_ID": agent_alias_id
+                **agent_environment,
+                "SESSION_METRICS_NAMESPACE": SESSION_METRICS_NAMESPACE,
+                "SESSION_METRICS_SERVICE": SESSION_METRICS_SERVICE,
+                "SESSION_METRICS_INTERVAL_SECONDS": "60"
             }
         )
 
@@ -168,6 +187,26 @@ class AppStack(Stack):
             ecs.PortMapping(container_port=8501)
         )
 
+        # The streaming API runs alongside the UI from the same image. Each SSE
+        # client costs a coroutine rather than a Streamlit script session, so
+        # one task serves many more API clients than browser sessions.
+        api_container = task_definition.add_container("ApiContainer",
+            image=ecs.ContainerImage.from_docker_image_asset(docker_image_asset),
+            command=["python", "api_server.py"],
+            logging=ecs.LogDrivers.aws_logs(
+                stream_prefix="api",
+                log_group=log_group
+            ),
+            environment={
+                **agent_environment,
+                "API_PORT": str(API_PORT)
+            }
+        )
+
+        api_container.add_port_mappings(
+            ecs.PortMapping(container_port=API_PORT)
+        )
+
         # Create ALB
         alb = elbv2.ApplicationLoadBalancer(
             self, "MyLoadBalancer",
@@ -181,6 +220,7 @@ class AppStack(Stack):
             self, "MyFargateService",
             cluster=cluster,
             task_definition=task_definition,
+            desired_count=2,
             security_groups=[service_security_group],
             assign_public_ip=False,
             vpc_subnets=ec2.SubnetSelection(
@@ -188,12 +228,16 @@ class AppStack(Stack):
             )
         )
 
-        # Add listener and target group
+        # Add listener and target group. Sticky sessions keep a browser's
+        # Streamlit websocket and session state on one task, and the longer
+        # deregistration delay lets running analyses finish on scale-in.
         listener = alb.add_listener("Listener", port=80)
         listener.add_targets("ECS",
             port=8501,
             protocol=elbv2.ApplicationProtocol.HTTP,
             targets=[service],
+            stickiness_cookie_duration=Duration.hours(1),
+            deregistration_delay=Duration.seconds(120),
             health_check=elbv2.HealthCheck(
                 path="/",
                 healthy_http_codes="200,302",
@@ -201,8 +245,48 @@ class AppStack(Stack):
             )
         )
 
+        # API listener. No stickiness: every request is self-contained, and the
+        # deregistration delay lets open streams finish on scale-in.
+        api_listener = alb.add_listener("ApiListener", port=API_PORT, protocol=elbv2.ApplicationProtocol.HTTP)
+        api_listener.add_targets("Api",
+            port=API_PORT,
+            protocol=elbv2.ApplicationProtocol.HTTP,
+            targets=[service.load_balancer_target(container_name="ApiContainer", container_port=API_PORT)],
+            deregistration_delay=Duration.seconds(120),
+            health_check=elbv2.HealthCheck(
+                path="/health",
+                healthy_http_codes="200",
+                port=str(API_PORT)
+            )
+        )
+
+        # Scale on active analysis sessions per task, with CPU as a backstop
+        scaling = service.auto_scale_task_count(min_capacity=2, max_capacity=10)
+        scaling.scale_to_track_custom_metric("ActiveSessionsScaling",
+            metric=cloudwatch.Metric(
+                namespace=SESSION_METRICS_NAMESPACE,
+                metric_name="ActiveAnalysisSessions",
+                dimensions_map={"ServiceName": SESSION_METRICS_SERVICE},
+                statistic="Average",
+                period=Duration.minutes(1)
+            ),
+            target_value=4,
+            scale_out_cooldown=Duration.seconds(60),
+            scale_in_cooldown=Duration.seconds(300)
+        )
+        scaling.scale_on_cpu_utilization("CpuScaling",
+            target_utilization_percent=60,
+            scale_out_cooldown=Duration.seconds(60),
+            scale_in_cooldown=Duration.seconds(300)
+        )
+
         # Output ALB DNS
         CfnOutput(
             self, "LoadBalancerDNS",
             value=alb.load_balancer_dns_name
+        )
+
+        CfnOutput(
+            self, "ApiUrl",
+            value=f"http://{alb.load_balancer_dns_name}:{API_PORT}"
         )
\ No newline at end of file
@@ -0,0 +1,150 @@
+import aws_cdk as cdk
+import aws_cdk.assertions as assertions
+import pytest
+
+import app_stack
+from app_stack import AppStack
+
+MANIFEST = {
+    "key": "0" * 64,
+    "final_supervisor_agent_id": "SUPERVISOR1",
+    "final_supervisor_agent_alias": "ALIAS1",
+    "agents": {
+        "news_agent": {"agent_id": "NEWS1", "agent_alias_id": "NEWSALIAS1"},
+        "stock_data_agent": {"agent_id": "DATA1", "agent_alias_id": "DATAALIAS1"},
+        "analyst_agent": {"agent_id": "ANALYST1", "agent_alias_id": "ANALYSTALIAS1"}
+    }
+}
+
+
+# Synthesize offline: the agent manifest is stubbed, so no AWS calls are made
+@pytest.fixture
+def template(monkeypatch):
+    monkeypatch.setattr(app_stack, "load_manifest", lambda role_arn: MANIFEST)
+    app = cdk.App()
+    stack = AppStack(app, "TestStack")
+    return assertions.Template.from_stack(stack)
+
+
+def test_task_is_right_sized(template):
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "Cpu": "1024",
+        "Memory": "2048"
+    })
+
+
+def test_container_gets_agent_and_session_metric_settings(template):
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([assertions.Match.object_like({
+            "Environment": assertions.Match.array_with([
+                {"Name": "AGENT_ID", "Value": "SUPERVISOR1"},
+                {"Name": "AGENT_ALIAS_ID", "Value": "ALIAS1"},
+                {"Name": "SESSION_METRICS_NAMESPACE", "Value": app_stack.SESSION_METRICS_NAMESPACE},
+                {"Name": "SESSION_METRICS_SERVICE", "Value": app_stack.SESSION_METRICS_SERVICE}
+            ])
+        })])
+    })
+
+
+def test_container_gets_collaborator_aliases_for_parallel_mode(template):
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([assertions.Match.object_like({
+            "Environment": assertions.Match.array_with([
+                {"Name": "NEWS_AGENT_ID", "Value": "NEWS1"},
+                {"Name": "NEWS_AGENT_ALIAS_ID", "Value": "NEWSALIAS1"},
+                {"Name": "STOCK_DATA_AGENT_ID", "Value": "DATA1"},
+                {"Name": "STOCK_DATA_AGENT_ALIAS_ID", "Value": "DATAALIAS1"},
+                {"Name": "ANALYST_AGENT_ID", "Value": "ANALYST1"},
+                {"Name": "ANALYST_AGENT_ALIAS_ID", "Value": "ANALYSTALIAS1"}
+            ])
+        })])
+    })
+
+
+def test_task_role_can_publish_session_metric(template):
+    template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {
+            "Statement": assertions.Match.array_with([assertions.Match.object_like({
+                "Action": "cloudwatch:PutMetricData",
+                "Condition": {"StringEquals": {"cloudwatch:namespace": app_stack.SESSION_METRICS_NAMESPACE}}
+            })])
+        }
+    })
+
+
+def test_service_scales_between_bounds(template):
+    template.has_resource_properties("AWS::ECS::Service", {"DesiredCount": 2})
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "MinCapacity": 2,
+        "MaxCapacity": 10,
+        "ScalableDimension": "ecs:service:DesiredCount"
+    })
+
+
+def test_scales_on_active_sessions(template):
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "PolicyType": "TargetTrackingScaling",
+        "TargetTrackingScalingPolicyConfiguration": assertions.Match.object_like({
+            "TargetValue": 4,
+            "CustomizedMetricSpecification": assertions.Match.object_like({
+                "MetricName": "ActiveAnalysisSessions",
+                "Namespace": app_stack.SESSION_METRICS_NAMESPACE,
+                "Statistic": "Average",
+                "Dimensions": [{"Name": "ServiceName", "Value": app_stack.SESSION_METRICS_SERVICE}]
+            })
+        })
+    })
+
+
+def test_scales_on_cpu(template):
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "TargetTrackingScalingPolicyConfiguration": assertions.Match.object_like({
+            "TargetValue": 60,
+            "PredefinedMetricSpecification": {"PredefinedMetricType": "ECSServiceAverageCPUUtilization"}
+        })
+    })
+
+
+def test_target_group_uses_sticky_sessions(template):
+    template.has_resource_properties("AWS::ElasticLoadBalancingV2::TargetGroup", {
+        "Port": 8501,
+        "TargetGroupAttributes": assertions.Match.array_with([
+            {"Key": "stickiness.enabled", "Value": "true"},
+            {"Key": "stickiness.type", "Value": "lb_cookie"},
+            {"Key": "stickiness.lb_cookie.duration_seconds", "Value": "3600"}
+        ])
+    })
+
+
+def test_api_runs_alongside_the_ui(template):
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([assertions.Match.object_like({
+            "Name": "ApiContainer",
+            "Command": ["python", "api_server.py"],
+            "PortMappings": [assertions.Match.object_like({"ContainerPort": app_stack.API_PORT})],
+            "Environment": assertions.Match.array_with([
+                {"Name": "AGENT_ID", "Value": "SUPERVISOR1"},
+                {"Name": "API_PORT", "Value": str(app_stack.API_PORT)}
+            ])
+        })])
+    })
+
+
+def test_api_has_its_own_listener_and_health_check(template):
+    template.has_resource_properties("AWS::ElasticLoadBalancingV2::Listener", {"Port": app_stack.API_PORT})
+    template.has_resource_properties("AWS::ElasticLoadBalancingV2::TargetGroup", {
+        "Port": app_stack.API_PORT,
+        "HealthCheckPath": "/health",
+        "HealthCheckPort": str(app_stack.API_PORT)
+    })
+    template.has_resource_properties("AWS::ECS::Service", {
+        "LoadBalancers": assertions.Match.array_with([
+            assertions.Match.object_like({"ContainerName": "ApiContainer", "ContainerPort": app_stack.API_PORT})
+        ])
+    })
+
+
+def test_synth_requires_a_manifest(monkeypatch):
+    monkeypatch.setattr(app_stack, "load_manifest", lambda role_arn: None)
+    with pytest.raises(ValueError, match="No agent manifest"):
+        AppStack(cdk.App(), "TestStack")
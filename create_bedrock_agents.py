@@ -1,17 +1,35 @@
-import boto3
+import argparse
+import hashlib
 import time
 import uuid
 from datetime import datetime
-import sys
 import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from aws_clients import get_client, client_stats, default_region
 
-# Check if enough arguments are provided
-if len(sys.argv) < 2:
-    print("Usage: python script.py <iam_role_arn>")
-    sys.exit(1)
+# Polling for state transitions: exponential backoff with full jitter, bounded
+# by an overall timeout per wait
+WAIT_TIMEOUT_SECONDS = float(os.environ.get('PROVISION_WAIT_TIMEOUT_SECONDS', '600'))
+POLL_BASE_DELAY = float(os.environ.get('PROVISION_POLL_BASE_DELAY', '1'))
+POLL_MAX_DELAY = float(os.environ.get('PROVISION_POLL_MAX_DELAY', '15'))
 
-# Extract the IAM Role ARN from the command-line arguments
-iam_role_arn = sys.argv[1]
+SUPERVISOR_AGENT_NAME = 'portfolio_assistant'
+
+# How long Bedrock keeps an idle session's conversation, which bounds how long
+# the app can send follow-up questions to the session a report was made in
+IDLE_SESSION_TTL_SECONDS = int(os.environ.get('AGENT_IDLE_SESSION_TTL_SECONDS', '1800'))
+
+# Tag holding the hash of the definition an agent was last deployed from
+DEFINITION_HASH_TAG = 'DefinitionHash'
+
+# Provisioning results are written to <AGENT_MANIFEST_DIR>/<key>.json, where the
+# key hashes the agent definitions, so a deploy can reuse them until they change
+AGENT_MANIFEST_DIR = os.environ.get(
+    'AGENT_MANIFEST_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_manifests'))
 
 # Custom JSON serializer for datetime objects
 def datetime_serializer(obj):
@@ -21,9 +39,7 @@ def datetime_serializer(obj):
 
 # Initialize the Bedrock Agent client
 def initialize_bedrock_agent_client():
-    return boto3.client(
-        'bedrock-agent'
-    )
+    return get_client('bedrock-agent')
 
 # Create an agent
 def create_agent(bedrock_agent_client, agent_name, foundation_model, description, agent_resource_role_arn, instruction, tags, agent_collaboration='DISABLED'):
@@ -33,6 +49,7 @@ def create_agent(bedrock_agent_client, agent_name, foundation_model, description
         agentResourceRoleArn=agent_resource_role_arn,
         description=description,
         foundationModel=foundation_model,
+        idleSessionTTLInSeconds=IDLE_SESSION_TTL_SECONDS,
         instruction=instruction,
         tags=tags
     )
@@ -85,56 +102,400 @@ def associate_agent_collaborator(bedrock_agent_client, agent_id, collaborator_na
     )
     return associate_response
 
-def create_agent_alias_descriptor(bedrock_agent_client, agent_name):
-    print("Inside Alias")
-    print(f"Agent name: {agent_name}")
-
-    # List agents to find the agentId for the given agent name
-    list_agents_response = bedrock_agent_client.list_agents(maxResults=123)
-    agent_id = None
-    for existing_agent in list_agents_response['agentSummaries']:
-        if existing_agent['agentName'] == agent_name:
-            agent_id = existing_agent['agentId']
-            break
-
-    print(f"Agent ID: {agent_id}")
-
-    # List agent aliases for the given agentId
-    alias_name = f"{agent_name}Alias"
-    list_aliases_response = bedrock_agent_client.list_agent_aliases(agentId=agent_id)
-    print(f"List aliases response: {list_aliases_response}")
-    agent_alias_summaries = list_aliases_response.get('agentAliasSummaries', [])
-
-    # Return the alias ARN if found
-    for alias in agent_alias_summaries:
-        if alias['agentAliasName'] == alias_name:
-            get_agent_alias_response = bedrock_agent_client.get_agent_alias(agentAliasId=alias['agentAliasId'], agentId=agent_id)
-            return {'aliasArn': get_agent_alias_response['agentAlias']['agentAliasArn']}
-
-    # If not found, create a new agent alias and return its ARN
-    create_agent_alias_response = bedrock_agent_client.create_agent_alias(
-        agentAliasName=alias_name,
-        agentId=agent_id,
-        description=f"Alias for the {agent_name} agent",
-        tags={
-            'Environment': 'Production',
-            'Project': 'AgentProject'
+# Call check() until it returns something truthy, sleeping with backoff between calls
+def wait_until(description, check, timeout=None):
+    timeout = WAIT_TIMEOUT_SECONDS if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        result = check()
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout:.0f}s waiting for {description}")
+        attempt += 1
+        time.sleep(min(remaining, random.uniform(0, min(POLL_MAX_DELAY, POLL_BASE_DELAY * 2 ** attempt))))
+
+# Wait for an agent to reach one of the given statuses
+def wait_for_agent_status(bedrock_agent_client, agent_id, agent_name, statuses):
+    def check():
+        agent = bedrock_agent_client.get_agent(agentId=agent_id)['agent']
+        if agent['agentStatus'] == 'FAILED':
+            raise RuntimeError(f"Agent '{agent_name}' failed: {agent.get('failureReasons')}")
+        return agent['agentStatus'] if agent['agentStatus'] in statuses else None
+    return wait_until(f"agent '{agent_name}' to be {' or '.join(statuses)}", check)
+
+def wait_for_agent_deleted(bedrock_agent_client, agent_id, agent_name):
+    def check():
+        try:
+            bedrock_agent_client.get_agent(agentId=agent_id)
+        except bedrock_agent_client.exceptions.ResourceNotFoundException:
+            return True
+        return False
+    return wait_until(f"agent '{agent_name}' to be deleted", check)
+
+def wait_for_alias_prepared(bedrock_agent_client, agent_id, agent_alias_id, agent_name):
+    def check():
+        alias = bedrock_agent_client.get_agent_alias(agentId=agent_id, agentAliasId=agent_alias_id)['agentAlias']
+        if alias['agentAliasStatus'] == 'FAILED':
+            raise RuntimeError(f"Alias of agent '{agent_name}' failed: {alias.get('failureReasons')}")
+        return alias['agentAliasStatus'] == 'PREPARED'
+    return wait_until(f"alias of agent '{agent_name}' to be prepared", check)
+
+# Wall-clock seconds per agent and provisioning phase, recorded from worker threads
+class PhaseTimer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, agent_name, phase):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self.lock:
+                agent_phases = self.phases.setdefault(agent_name, {})
+                agent_phases[phase] = agent_phases.get(phase, 0.0) + elapsed
+
+    def summary(self, agent_names, wall_seconds):
+        lines = ["Provisioning timing summary:"]
+        for agent_name in agent_names:
+            agent_phases = self.phases.get(agent_name, {})
+            parts = [f"{phase} {seconds:.1f}s" for phase, seconds in agent_phases.items()]
+            parts.append(f"total {sum(agent_phases.values()):.1f}s")
+            lines.append(f"  {agent_name:<20} " + "  ".join(parts))
+        lines.append(f"  {'wall clock':<20} {wall_seconds:.1f}s")
+        return "\n".join(lines)
+
+# Hash of everything that defines a deployed agent. A supervisor's hash covers
+# its collaborators' alias ARNs, which stay the same when they are updated in place.
+def definition_hash(agent, agent_resource_role_arn, collaborator_alias_arns=None):
+    definition = dict(agent, agent_resource_role_arn=agent_resource_role_arn,
+                      collaborator_alias_arns=collaborator_alias_arns or {},
+                      idle_session_ttl_seconds=IDLE_SESSION_TTL_SECONDS)
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode('utf8')).hexdigest()
+
+def paginate(bedrock_agent_client, operation, result_key, **kwargs):
+    items = []
+    for page in bedrock_agent_client.get_paginator(operation).paginate(**kwargs):
+        items.extend(page.get(result_key, []))
+    return items
+
+# Everything reconciliation needs to know about one existing agent
+def describe_agent(bedrock_agent_client, agent_id):
+    agent = bedrock_agent_client.get_agent(agentId=agent_id)['agent']
+    tags = bedrock_agent_client.list_tags_for_resource(resourceArn=agent['agentArn']).get('tags', {})
+    aliases = paginate(bedrock_agent_client, 'list_agent_aliases', 'agentAliasSummaries', agentId=agent_id)
+    action_groups = paginate(bedrock_agent_client, 'list_agent_action_groups', 'actionGroupSummaries',
+                             agentId=agent_id, agentVersion='DRAFT')
+    collaborators = []
+    if agent.get('agentCollaboration', 'DISABLED') != 'DISABLED':
+        collaborators = paginate(bedrock_agent_client, 'list_agent_collaborators', 'agentCollaboratorSummaries',
+                                 agentId=agent_id, agentVersion='DRAFT')
+    return {
+        'agent_id': agent_id,
+        'agent_status': agent['agentStatus'],
+        'definition_hash': tags.get(DEFINITION_HASH_TAG),
+        'agent_arn': agent['agentArn'],
+        'aliases': {alias['agentAliasName']: alias for alias in aliases},
+        'action_groups': {group['actionGroupName']: group['actionGroupId'] for group in action_groups},
+        'collaborators': {collaborator['collaboratorName']: collaborator for collaborator in collaborators}
+    }
+
+# One paginated listing of all agents, then the details of the ones we manage,
+# fetched concurrently. Returns {agent_name: description} for existing agents.
+def build_agent_index(bedrock_agent_client, agent_names):
+    summaries = paginate(bedrock_agent_client, 'list_agents', 'agentSummaries')
+    agent_ids = {summary['agentName']: summary['agentId'] for summary in summaries if summary['agentName'] in agent_names}
+    with ThreadPoolExecutor(max_workers=max(1, len(agent_ids))) as executor:
+        futures = {name: executor.submit(describe_agent, bedrock_agent_client, agent_id) for name, agent_id in agent_ids.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+# Function schema for an agent's action group
+def build_function_schema(agent):
+    function_schema = {
+        'functions': [
+            {
+                'description': f"Function to {agent['action_group_function_name']}.",
+                'name': agent['action_group_function_name'],
+                'parameters': {},
+                'requireConfirmation': 'DISABLED'
+            }
+        ]
+    }
+    for param in agent['parameters']:
+        function_schema['functions'][0]['parameters'][param['name']] = {
+            'description': param['description'],
+            'required': param.get('required', True),
+            'type': param.get('type', 'string')
         }
-    )
-    return {'aliasArn': create_agent_alias_response['aliasArn']}
+    return function_schema
+
+def collaborator_alias_arns(agent, provisioned):
+    return {name: provisioned[name]['agent_alias_arn'] for name in agent['collaborators'] or []}
+
+# Build one agent from scratch: delete any existing agent of the same name,
+# create it, add its action group or collaborators, prepare it and create its
+# alias. `provisioned` holds the results of the agents it depends on and
+# `existing` the index entry of the agent, if it exists.
+def provision_agent(bedrock_agent_client, agent, agent_resource_role_arn, provisioned, existing, timer):
+    agent_name = agent['agent_name']
+    alias_arns = collaborator_alias_arns(agent, provisioned)
+    tags = {
+        'Environment': 'Production',
+        'Project': 'AgentProject',
+        DEFINITION_HASH_TAG: definition_hash(agent, agent_resource_role_arn, alias_arns)
+    }
 
-def main():
-    
-    # Get AWS account and region details
-    session = boto3.session.Session()
-    region = session.region_name
+    # If the agent exists, delete it
+    if existing:
+        agent_id = existing['agent_id']
+        print(f"Deleting existing agent '{agent_name}' with agentId '{agent_id}'...")
+        with timer.phase(agent_name, 'delete'):
+            bedrock_agent_client.delete_agent(
+                agentId=agent_id,
+                skipResourceInUseCheck=True  # Skipping resource check to force delete
+            )
+            wait_for_agent_deleted(bedrock_agent_client, agent_id, agent_name)
+
+    print(f"Creating agent '{agent_name}'...")
+    with timer.phase(agent_name, 'create'):
+        agent_collaboration = 'SUPERVISOR' if agent['collaborators'] else 'DISABLED'
+        agent_id = create_agent(bedrock_agent_client, agent_name, agent['foundation_model'], agent['description'],
+                                agent_resource_role_arn, agent['instruction'], tags, agent_collaboration)
+        wait_for_agent_status(bedrock_agent_client, agent_id, agent_name, ('NOT_PREPARED', 'PREPARED'))
+
+    # Create an action group for the agent if required
+    if agent['action_group_name']:
+        with timer.phase(agent_name, 'action_group'):
+            create_agent_action_group(bedrock_agent_client, agent_id, agent['action_group_name'], agent['action_group_executor'], 'ENABLED',
+                                      f"Action group to {agent['action_group_function_name']} with parameters", build_function_schema(agent))
+
+    if agent['collaborators']:
+        with timer.phase(agent_name, 'collaborators'):
+            for collaborator_name in agent['collaborators']:
+                print(f"Adding collaborator '{collaborator_name}' to agent '{agent_name}'...")
+                associate_agent_collaborator(bedrock_agent_client, agent_id, collaborator_name,
+                                             {'aliasArn': alias_arns[collaborator_name]})
+
+    # Prepare the agent once its action group and collaborators are in place
+    print(f"Preparing agent '{agent_name}'...")
+    with timer.phase(agent_name, 'prepare'):
+        prepare_agent(bedrock_agent_client, agent_id)
+        wait_for_agent_status(bedrock_agent_client, agent_id, agent_name, ('PREPARED',))
+
+    # Create an agent alias for the prepared agent
+    with timer.phase(agent_name, 'alias'):
+        agent_alias = create_agent_alias(bedrock_agent_client, agent_id, f'{agent_name}Alias')['agentAlias']
+        wait_for_alias_prepared(bedrock_agent_client, agent_id, agent_alias['agentAliasId'], agent_name)
+
+    print(f"Agent '{agent_name}' is ready.")
+    return {
+        'agent_id': agent_id,
+        'agent_alias_id': agent_alias['agentAliasId'],
+        'agent_alias_arn': agent_alias['agentAliasArn']
+    }
 
-    sts_client = boto3.client("sts")
-    account_id = sts_client.get_caller_identity()["Account"]
+# Bring an existing agent in line with its definition without deleting it.
+# Nothing is called when the definition hash matches and the agent and its
+# alias are prepared. Otherwise the DRAFT is updated in place and prepared, and
+# the alias is moved to a new version: it keeps serving the previous version
+# until then. New agents are created as in provision_agent().
+def reconcile_agent(bedrock_agent_client, agent, agent_resource_role_arn, provisioned, existing, timer):
+    if not existing:
+        return provision_agent(bedrock_agent_client, agent, agent_resource_role_arn, provisioned, None, timer)
+
+    agent_name = agent['agent_name']
+    agent_id = existing['agent_id']
+    alias_arns = collaborator_alias_arns(agent, provisioned)
+    desired_hash = definition_hash(agent, agent_resource_role_arn, alias_arns)
+    alias = existing['aliases'].get(f'{agent_name}Alias')
+    changed = existing['definition_hash'] != desired_hash
+    prepared = existing['agent_status'] == 'PREPARED'
+
+    if not changed and prepared and alias and alias['agentAliasStatus'] == 'PREPARED':
+        print(f"Agent '{agent_name}' is up to date.")
+        return {
+            'agent_id': agent_id,
+            'agent_alias_id': alias['agentAliasId'],
+            'agent_alias_arn': bedrock_agent_client.get_agent_alias(agentId=agent_id, agentAliasId=alias['agentAliasId'])['agentAlias']['agentAliasArn']
+        }
 
-    bedrock_agent_client = initialize_bedrock_agent_client()
+    if changed:
+        print(f"Updating agent '{agent_name}'...")
+        with timer.phase(agent_name, 'update'):
+            bedrock_agent_client.update_agent(
+                agentId=agent_id,
+                agentName=agent_name,
+                agentResourceRoleArn=agent_resource_role_arn,
+                agentCollaboration='SUPERVISOR' if agent['collaborators'] else 'DISABLED',
+                description=agent['description'],
+                foundationModel=agent['foundation_model'],
+                idleSessionTTLInSeconds=IDLE_SESSION_TTL_SECONDS,
+                instruction=agent['instruction']
+            )
+            wait_for_agent_status(bedrock_agent_client, agent_id, agent_name, ('NOT_PREPARED', 'PREPARED'))
+
+        if agent['action_group_name']:
+            with timer.phase(agent_name, 'action_group'):
+                description = f"Action group to {agent['action_group_function_name']} with parameters"
+                action_group_id = existing['action_groups'].get(agent['action_group_name'])
+                if action_group_id:
+                    bedrock_agent_client.update_agent_action_group(
+                        agentId=agent_id,
+                        agentVersion='DRAFT',
+                        actionGroupId=action_group_id,
+                        actionGroupName=agent['action_group_name'],
+                        actionGroupExecutor=agent['action_group_executor'],
+                        actionGroupState='ENABLED',
+                        description=description,
+                        functionSchema=build_function_schema(agent)
+                    )
+                else:
+                    create_agent_action_group(bedrock_agent_client, agent_id, agent['action_group_name'], agent['action_group_executor'],
+                                              'ENABLED', description, build_function_schema(agent))
+
+        with timer.phase(agent_name, 'collaborators'):
+            for collaborator_name, alias_arn in alias_arns.items():
+                current = existing['collaborators'].get(collaborator_name)
+                if current is None:
+                    print(f"Adding collaborator '{collaborator_name}' to agent '{agent_name}'...")
+                    associate_agent_collaborator(bedrock_agent_client, agent_id, collaborator_name, {'aliasArn': alias_arn})
+                elif current['agentDescriptor'].get('aliasArn') != alias_arn:
+                    bedrock_agent_client.update_agent_collaborator(
+                        agentId=agent_id,
+                        agentVersion='DRAFT',
+                        collaboratorId=current['collaboratorId'],
+                        collaboratorName=collaborator_name,
+                        agentDescriptor={'aliasArn': alias_arn},
+                        collaborationInstruction=current['collaborationInstruction']
+                    )
+            for collaborator_name, current in existing['collaborators'].items():
+                if collaborator_name not in alias_arns:
+                    print(f"Removing collaborator '{collaborator_name}' from agent '{agent_name}'...")
+                    bedrock_agent_client.disassociate_agent_collaborator(
+                        agentId=agent_id, agentVersion='DRAFT', collaboratorId=current['collaboratorId'])
+
+    if changed or not prepared:
+        print(f"Preparing agent '{agent_name}'...")
+        with timer.phase(agent_name, 'prepare'):
+            prepare_agent(bedrock_agent_client, agent_id)
+            wait_for_agent_status(bedrock_agent_client, agent_id, agent_name, ('PREPARED',))
+
+    # Point the alias at a new version of the prepared DRAFT
+    with timer.phase(agent_name, 'alias'):
+        if alias:
+            agent_alias = bedrock_agent_client.update_agent_alias(
+                agentId=agent_id,
+                agentAliasId=alias['agentAliasId'],
+                agentAliasName=alias['agentAliasName'],
+                description=alias.get('description') or 'Alias for the agent'
+            )['agentAlias']
+        else:
+            agent_alias = create_agent_alias(bedrock_agent_client, agent_id, f'{agent_name}Alias')['agentAlias']
+        wait_for_alias_prepared(bedrock_agent_client, agent_id, agent_alias['agentAliasId'], agent_name)
+
+    # Recorded last, so an interrupted update is retried on the next run
+    bedrock_agent_client.tag_resource(resourceArn=existing['agent_arn'], tags={DEFINITION_HASH_TAG: desired_hash})
+    print(f"Agent '{agent_name}' is ready.")
+    return {
+        'agent_id': agent_id,
+        'agent_alias_id': agent_alias['agentAliasId'],
+        'agent_alias_arn': agent_alias['agentAliasArn']
+    }
 
-    agents = [
+# Provision agents as a dependency graph: an agent starts as soon as all of its
+# collaborators are ready, so independent agents are built concurrently.
+# `deploy` is reconcile_agent or provision_agent. Returns (provisioned, failed)
+# keyed by agent name.
+def provision_agents(bedrock_agent_client, agents, agent_resource_role_arn, index, deploy, timer):
+    pending = {agent['agent_name']: agent for agent in agents}
+    known = set(pending)
+    provisioned = {}
+    failed = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=len(agents)) as executor:
+        while pending or running:
+            for agent_name, agent in list(pending.items()):
+                dependencies = agent['collaborators'] or []
+                blocked = [name for name in dependencies if name in failed or name not in known]
+                if blocked:
+                    failed[agent_name] = f"collaborators not available: {', '.join(blocked)}"
+                    del pending[agent_name]
+                elif all(name in provisioned for name in dependencies):
+                    future = executor.submit(deploy, bedrock_agent_client, agent, agent_resource_role_arn, provisioned,
+                                             index.get(agent_name), timer)
+                    running[future] = agent_name
+                    del pending[agent_name]
+
+            if not running:
+                # Whatever is still pending waits on itself
+                for agent_name in pending:
+                    failed[agent_name] = "circular collaborator dependency"
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                agent_name = running.pop(future)
+                try:
+                    provisioned[agent_name] = future.result()
+                except Exception as e:
+                    failed[agent_name] = str(e)
+                    print(f"Error provisioning agent '{agent_name}': {e}")
+
+    return provisioned, failed
+
+def manifest_key(agents, iam_role_arn, region):
+    definitions = {'agents': agents, 'iam_role_arn': iam_role_arn, 'region': region,
+                   'idle_session_ttl_seconds': IDLE_SESSION_TTL_SECONDS}
+    return hashlib.sha256(json.dumps(definitions, sort_keys=True).encode('utf8')).hexdigest()
+
+def manifest_path(key):
+    return os.path.join(AGENT_MANIFEST_DIR, f'{key}.json')
+
+def write_manifest(key, provisioned):
+    supervisor = provisioned[SUPERVISOR_AGENT_NAME]
+    manifest = {
+        'key': key,
+        'created_at': datetime.now().astimezone().isoformat(),
+        'final_supervisor_agent_id': supervisor['agent_id'],
+        'final_supervisor_agent_alias': supervisor['agent_alias_id'],
+        'agents': provisioned
+    }
+    os.makedirs(AGENT_MANIFEST_DIR, exist_ok=True)
+    path = manifest_path(key)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+    return path
+
+# Manifest of the last successful deploy of the current agent definitions, or
+# None if they have not been deployed since they last changed
+def load_manifest(iam_role_arn):
+    region = default_region()
+    account_id = get_client("sts").get_caller_identity()["Account"]
+    key = manifest_key(agent_definitions(region, account_id), iam_role_arn, region)
+    try:
+        with open(manifest_path(key)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+# Collaborators the app's parallel mode invokes directly. The deploy passes
+# each alias to the app as <PREFIX>_AGENT_ID and <PREFIX>_AGENT_ALIAS_ID.
+COLLABORATOR_ENV_PREFIXES = {
+    'news_agent': 'NEWS',
+    'stock_data_agent': 'STOCK_DATA',
+    'analyst_agent': 'ANALYST'
+}
+
+# Desired agents, in the account and region the action group Lambdas live in
+def agent_definitions(region, account_id):
+    return [
         {
             'agent_name': 'news_agent',
             # 'foundation_model': "anthropic.claude-3-5-haiku-20241022-v1:0",
@@ -145,6 +506,7 @@ def main():
             'action_group_executor': {'lambda': f'arn:aws:lambda:{region}:{account_id}:function:web_search'},
             
             'action_group_function_name': 'web_search',
+            'collaborators': None,
             'parameters': [
                 {
                     'name': 'days',
@@ -152,11 +514,19 @@ def main():
                 },
                 {
                     'name': 'search_query',
-                    'description': "The query to search the web with"
+                    'description': "The query to search the web with",
+                    'required': False
+                },
+                {
+                    'name': 'search_queries',
+                    'description': "Several queries to run in one call, e.g. company news, sector news and macro context. They are searched concurrently and the results come back merged and ranked. Preferred over several separate searches.",
+                    'required': False,
+                    'type': 'array'
                 },
                 {
                     'name': 'target_website',
-                    'description': "The specific website to search including its domain name. If not provided, the most relevant website will be used"
+                    'description': "The specific website to search including its domain name, or a comma separated list of websites to search each of them. If not provided, the most relevant website will be used",
+                    'required': False
                 },
                 {
                     'name': 'topic',
@@ -173,10 +543,33 @@ def main():
             'action_group_name': 'actions_stock_data_agent',
             'action_group_executor': {'lambda': f'arn:aws:lambda:{region}:{account_id}:function:stock_data_lookup'},
             'action_group_function_name': 'stock_data_lookup',
+            'collaborators': None,
             'parameters': [
                 {
                     'name': 'ticker',
-                    'description': "The ticker to retrieve price history for"
+                    'description': "The ticker to retrieve price history for",
+                    'required': False
+                },
+                {
+                    'name': 'tickers',
+                    'description': "Several tickers to compare in one call, e.g. the stock with its peers or a sector ETF. Fetched in one batched request and returned as aligned series (or summaries with mode 'summary').",
+                    'required': False,
+                    'type': 'array'
+                },
+                {
+                    'name': 'mode',
+                    'description': "'summary' returns a compact technical digest of the last year (returns, volatility, SMA/EMA, RSI, MACD, drawdown, volume anomalies, 52-week range) and is preferred. 'raw' returns the price bars for the requested period and interval. Defaults to 'raw'.",
+                    'required': False
+                },
+                {
+                    'name': 'period',
+                    'description': "Range of 'raw' price history: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd or max. Defaults to 1mo. Long ranges are downsampled to weekly, monthly or quarterly bars so the result stays small.",
+                    'required': False
+                },
+                {
+                    'name': 'interval',
+                    'description': "Bar size of 'raw' price history: 1m, 5m, 15m, 30m, 1h (intraday, last 60 days only), 1d, 1wk or 1mo. Defaults to 1d.",
+                    'required': False
                 }
             ]
         },
@@ -189,6 +582,7 @@ def main():
             'action_group_name': None,
             'action_group_executor': None,
             'action_group_function_name': None,
+            'collaborators': None,
             'parameters': None
         },
         {
@@ -200,176 +594,51 @@ def main():
             'action_group_name': None,
             'action_group_executor': None,
             'action_group_function_name': None,
+            'collaborators': ['news_agent', 'stock_data_agent', 'analyst_agent'],
             'parameters': None
         }
     ]
 
-    for agent in agents:
-        try:
-            # List all agents to find the agentId for the given agent name
-            print(f"Listing agents to find the agent ID for '{agent['agent_name']}'...")
-            list_agents_response = bedrock_agent_client.list_agents(maxResults=123)
-
-            # Find the agentId for the given agent name
-            agent_id = None
-            for existing_agent in list_agents_response['agentSummaries']:
-                if existing_agent['agentName'] == agent['agent_name']:
-                    agent_id = existing_agent['agentId']
-                    print(f"Found agent '{agent['agent_name']}' with agentId '{agent_id}'")
-                    break
-
-            # If the agent exists, delete it
-            if agent_id:
-                print(f"Deleting existing agent '{agent['agent_name']}' with agentId '{agent_id}'...")
-                delete_response = bedrock_agent_client.delete_agent(
-                    agentId=agent_id,
-                    skipResourceInUseCheck=True  # Skipping resource check to force delete
-                )
-
-                # Wait for the agent to be fully deleted
-                print("Waiting for agent deletion to complete...")
-                while True:
-                    time.sleep(5)  # Poll every 5 seconds to check for deletion
-                    try:
-                        get_agent_response = bedrock_agent_client.get_agent(agentId=agent_id)
-                    except bedrock_agent_client.exceptions.ResourceNotFoundException:
-                        print(f"Agent '{agent['agent_name']}' successfully deleted.")
-                        break
-
-            # Create the agent after deletion or if it did not exist
-            print(f"Creating agent '{agent['agent_name']}'...")
-            if agent['agent_name'] == 'portfolio_assistant':
-                agent_id = create_agent(bedrock_agent_client, agent['agent_name'], agent['foundation_model'], agent['description'], iam_role_arn, agent['instruction'], {
-                    'Environment': 'Production',
-                    'Project': 'AgentProject'}, 'SUPERVISOR')
-            else:
-                agent_id = create_agent(bedrock_agent_client, agent['agent_name'], agent['foundation_model'], agent['description'], iam_role_arn, agent['instruction'], {
-                    'Environment': 'Production',
-                    'Project': 'AgentProject'})
-
-            # Wait until the agent is in a valid state before preparing it
-            print(f"Waiting for agent '{agent['agent_name']}' to be in a valid state...")
-            while True:
-                time.sleep(5)  # Poll every 5 seconds to check the agent's status
-                get_agent_response = bedrock_agent_client.get_agent(agentId=agent_id)
-                agent_status = get_agent_response['agent']['agentStatus']
-
-                if agent_status in ['PREPARED', 'NOT_PREPARED']:
-                    if agent['agent_name'] == 'portfolio_assistant':
-                        print(f"Agent '{agent['agent_name']}' is in a valid state: {agent_status}. Proceeding to add collaborators.")
-                        break
-                    else:
-                        print(f"Agent '{agent['agent_name']}' is in a valid state: {agent_status}. Proceeding to prepare.")
-                        break
-                elif agent_status == 'FAILED':
-                    print(f"Agent '{agent['agent_name']}' creation failed.")
-                    break
-                else:
-                    print(f"Agent '{agent['agent_name']}' is still in '{agent_status}' state. Retrying...")
-
-            if agent['agent_name'] == 'portfolio_assistant':
-                print("Adding Collabs")
-                # Add collaborators
-                collaborator_agents = [
-                    {
-                        'collaborator_name': 'news_agent',
-                        'agent_descriptor': create_agent_alias_descriptor(bedrock_agent_client, 'news_agent')
-                    },
-                    {
-                        'collaborator_name': 'stock_data_agent',
-                        'agent_descriptor': create_agent_alias_descriptor(bedrock_agent_client, 'stock_data_agent')
-                    },
-                    {
-                        'collaborator_name': 'analyst_agent',
-                        'agent_descriptor': create_agent_alias_descriptor(bedrock_agent_client, 'analyst_agent')
-                    }
-                ]
-                for collaborator in collaborator_agents:
-                    try:
-                        print(f"Adding collaborator '{collaborator['collaborator_name']}' to agent '{agent['agent_name']}'...")
-                        print(f"Agent ID: {agent_id}")
-                        print(f"Collaborator Descriptor: {collaborator['agent_descriptor']}")
-                        print(f"Collaborator Name: {collaborator['collaborator_name']}")
-                        
-                        # Associate the collaborator
-                        bedrock_agent_client.associate_agent_collaborator(
-                            agentDescriptor=collaborator['agent_descriptor'],
-                            agentId=agent_id,
-                            agentVersion='DRAFT',
-                            collaborationInstruction="Collaborator will help with agent training",
-                            collaboratorName=collaborator['collaborator_name']
-                        )
-                        print(f"Collaborator '{collaborator['collaborator_name']}' added successfully.")
-                    except Exception as e:
-                        print(f"Error adding collaborator '{collaborator['collaborator_name']}': {e}")
-
-                # Prepare the agent after collaborators are added
-                print(f"Preparing agent '{agent['agent_name']}'...")
-                prepare_agent(bedrock_agent_client, agent_id)
-
-                # Wait until the agent is fully prepared
-                print(f"Waiting for agent '{agent['agent_name']}' to be fully prepared...")
-                while True:
-                    time.sleep(5)  # Poll every 5 seconds to check the agent's status
-                    get_agent_response = bedrock_agent_client.get_agent(agentId=agent_id)
-                    print(f"Agent Response: {get_agent_response}")
-                    agent_status = get_agent_response['agent']['agentStatus']
-                    print(f"Agent Status: {agent_status}")
-
-                    if agent_status == 'PREPARED':
-                        print(f"Agent '{agent['agent_name']}' is fully prepared.")
-                        break
-                    else:
-                        print(f"Agent '{agent['agent_name']}' is still in '{agent_status}' state. Retrying...")
-            else:
-                # Prepare the agent after it is in a valid state
-                print(f"Preparing agent '{agent['agent_name']}'...")
-                prepare_agent(bedrock_agent_client, agent_id)
-
-                # Wait until the agent is fully prepared
-                print(f"Waiting for agent '{agent['agent_name']}' to be fully prepared...")
-                while True:
-                    time.sleep(5)  # Poll every 5 seconds to check the agent's status
-                    get_agent_response = bedrock_agent_client.get_agent(agentId=agent_id)
-                    agent_status = get_agent_response['agent']['agentStatus']
-
-                    if agent_status == 'PREPARED':
-                        print(f"Agent '{agent['agent_name']}' is fully prepared.")
-                        break
-                    else:
-                        print(f"Agent '{agent['agent_name']}' is still in '{agent_status}' state. Retrying...")
-
-            # Create an action group for the agent if required
-            if agent['action_group_name']:
-                function_schema = {
-                    'functions': [
-                        {
-                            'description': f"Function to {agent['action_group_function_name']}.",
-                            'name': agent['action_group_function_name'],
-                            'parameters': {},
-                            'requireConfirmation': 'DISABLED'
-                        }
-                    ]
-                }
-                for param in agent['parameters']:
-                    function_schema['functions'][0]['parameters'][param['name']] = {
-                        'description': param['description'],
-                        'required': True,
-                        'type': 'string'
-                    }
-                create_agent_action_group(bedrock_agent_client, agent_id, agent['action_group_name'], agent['action_group_executor'], 'ENABLED', f"Action group to {agent['action_group_function_name']} with parameters", function_schema)
+# Deploy the agents. By default existing agents are reconciled in place;
+# with recreate=True they are deleted and created again.
+def main(iam_role_arn, recreate=False):
+    
+    # Get AWS account and region details
+    region = default_region()
 
-            # Create an agent alias for the prepared agent
-            agent_alias_response = create_agent_alias(bedrock_agent_client, agent_id, f'{agent["agent_name"]}Alias')
-            agent_alias_id = agent_alias_response['agentAlias']['agentAliasId']
+    sts_client = get_client("sts")
+    account_id = sts_client.get_caller_identity()["Account"]
 
-        except Exception as e:
-            print(f"Error: {e}")
+    bedrock_agent_client = initialize_bedrock_agent_client()
 
-    return agent_id, agent_alias_id
+    agents = agent_definitions(region, account_id)
+
+    timer = PhaseTimer()
+    start = time.monotonic()
+    with timer.phase('all agents', 'index'):
+        index = build_agent_index(bedrock_agent_client, {agent['agent_name'] for agent in agents})
+    deploy = provision_agent if recreate else reconcile_agent
+    provisioned, failed = provision_agents(bedrock_agent_client, agents, iam_role_arn, index, deploy, timer)
+    print(timer.summary(['all agents'] + [agent['agent_name'] for agent in agents], time.monotonic() - start))
+
+    for agent_name, error in failed.items():
+        print(f"Agent '{agent_name}' was not provisioned: {error}")
+
+    if not failed:
+        path = write_manifest(manifest_key(agents, iam_role_arn, region), provisioned)
+        print(f"Wrote agent manifest {path}")
+
+    supervisor = provisioned.get(SUPERVISOR_AGENT_NAME, {})
+    return supervisor.get('agent_id'), supervisor.get('agent_alias_id')
 
 if __name__ == "__main__":
-    agent_id, agent_alias_id = main()
+    parser = argparse.ArgumentParser(description="Deploy the Bedrock agents and print the supervisor agent and alias IDs.")
+    parser.add_argument('iam_role_arn', help="Service role the agents run with")
+    parser.add_argument('--recreate', action='store_true', help="Delete and recreate every agent instead of updating changed ones in place")
+    args = parser.parse_args()
+
+    agent_id, agent_alias_id = main(args.iam_role_arn, args.recreate)
+    print(f"AWS client stats: {client_stats()}")
     
     # Print output as JSON
     output = {
@@ -0,0 +1,60 @@
+import json
+import time
+from datetime import datetime
+
+
+# Convert a recorded event (chunk bytes stored as text) back into the shape
+# returned by the real event stream
+def decode_event(event):
+    if 'chunk' in event:
+        chunk = dict(event['chunk'])
+        if isinstance(chunk.get('bytes'), str):
+            chunk['bytes'] = chunk['bytes'].encode('utf8')
+        event = dict(event, chunk=chunk)
+    return event
+
+
+# Load a recorded completion stream: a JSON file with an "events" list
+def load_recording(path):
+    with open(path) as f:
+        recording = json.load(f)
+    return recording['events']
+
+
+def event_time(event):
+    value = event.get('trace', {}).get('eventTime')
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+# Local stand-in for the bedrock-agent-runtime client. invoke_agent() replays
+# the recorded events, sleeping `delay` seconds before each one. With
+# `time_scale`, trace events instead wait for their recorded eventTime gap
+# multiplied by that factor (1.0 replays at the original pace).
+class FakeAgentRuntimeClient:
+    def __init__(self, events, delay=0.0, time_scale=None):
+        self.events = events
+        self.delay = delay
+        self.time_scale = time_scale
+        self.calls = []
+
+    def invoke_agent(self, **kwargs):
+        self.calls.append(kwargs)
+        return {
+            'completion': self._replay(),
+            'contentType': 'application/json',
+            'sessionId': kwargs.get('sessionId')
+        }
+
+    def _replay(self):
+        previous = None
+        for event in self.events:
+            recorded = event_time(event) if self.time_scale is not None else None
+            if recorded is not None:
+                if previous is not None and recorded > previous:
+                    time.sleep((recorded - previous) * self.time_scale)
+                previous = recorded
+            elif self.delay:
+                time.sleep(self.delay)
+            yield decode_event(event)
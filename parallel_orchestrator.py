@@ -0,0 +1,150 @@
+import os
+import queue
+import threading
+import time
+
+import streamlit as st
+
+from agent_handler import BedrockAgentHandler
+from agent_sessions import session_info
+from create_bedrock_agents import COLLABORATOR_ENV_PREFIXES
+from stream_renderer import StreamRenderer
+
+# Independent research lanes run concurrently; the analyst runs after both
+RESEARCH_LANES = ['news_agent', 'stock_data_agent']
+ANALYST_LANE = 'analyst_agent'
+
+LANE_TITLES = {
+    'news_agent': 'News',
+    'stock_data_agent': 'Stock Data',
+    'analyst_agent': 'Analysis'
+}
+
+
+def collaborator_ids(name):
+    prefix = COLLABORATOR_ENV_PREFIXES[name]
+    return os.environ.get(f'{prefix}_AGENT_ID'), os.environ.get(f'{prefix}_AGENT_ALIAS_ID')
+
+
+# Parallel mode needs the IDs of every collaborator alias
+def parallel_mode_available():
+    return all(all(collaborator_ids(name)) for name in COLLABORATOR_ENV_PREFIXES)
+
+
+def research_prompt(name, ticker):
+    if name == 'news_agent':
+        return f"Fetch the latest relevant news for the stock with ticker {ticker} and summarize it."
+    return f"Retrieve and summarize how the price of the stock with ticker {ticker} has been moving lately."
+
+
+def analysis_prompt(ticker, news, stock_data):
+    return (
+        f"Analyze a potential stock investment in ticker {ticker}. Give back a well written and carefully "
+        f"considered report with considerations for a potential investor.\n\n"
+        f"News summary:\n{news}\n\n"
+        f"Stock price summary:\n{stock_data}"
+    )
+
+
+# Runs the supervisor's plan on the client: news_agent and stock_data_agent are
+# invoked concurrently, then analyst_agent gets both results in one invocation,
+# so the critical path is max(news, stock data) + analysis instead of the sum.
+class ParallelOrchestrator:
+    def __init__(self, client=None):
+        self.handlers = {
+            name: BedrockAgentHandler(client, *collaborator_ids(name))
+            for name in COLLABORATOR_ENV_PREFIXES
+        }
+        self.start_time = None
+        self.results = {}
+        self.timings = {}
+
+        # Final report and lane-labelled steps of the last run, kept for the cache
+        self.report = ''
+        self.steps = []
+
+    # Follow-up questions go to the analyst's session, which has both research
+    # results in its context
+    def analyst_session(self):
+        return session_info(self.handlers[ANALYST_LANE])
+
+    def _run_lane(self, name, prompt, events):
+        started = time.time()
+        chunks = []
+        try:
+            for kind, text in self.handlers[name].stream(prompt):
+                if kind == 'chunk':
+                    chunks.append(text)
+                events.put((name, kind, text))
+            self.results[name] = ''.join(chunks)
+            self.timings[name] = round(time.time() - started, 3)
+        except Exception as e:
+            events.put((name, 'error', e))
+        finally:
+            events.put((name, 'done', None))
+
+    # Yield (lane, 'chunk' | 'step', text) items: the research lanes interleaved
+    # as their events arrive, then the analyst lane
+    def stream(self, ticker):
+        started = time.time()
+        events = queue.Queue()
+        for name in RESEARCH_LANES:
+            threading.Thread(
+                target=self._run_lane,
+                args=(name, research_prompt(name, ticker), events),
+                daemon=True
+            ).start()
+
+        running = len(RESEARCH_LANES)
+        while running:
+            lane, kind, text = events.get()
+            if kind == 'done':
+                running -= 1
+            elif kind == 'error':
+                raise text
+            else:
+                yield lane, kind, text
+
+        analysis_started = time.time()
+        prompt = analysis_prompt(ticker, self.results['news_agent'], self.results['stock_data_agent'])
+        for kind, text in self.handlers[ANALYST_LANE].stream(prompt):
+            yield ANALYST_LANE, kind, text
+        self.timings[ANALYST_LANE] = round(time.time() - analysis_started, 3)
+        self.timings['total'] = round(time.time() - started, 3)
+
+    # Render a run into one StreamRenderer per lane, each through its lane's
+    # handler. `events` lets the caller supply the (lane, kind, text) items,
+    # e.g. from a shared flight.
+    def invoke(self, ticker, renderers, events=None):
+        steps = []
+        try:
+            for lane, renderer in renderers.items():
+                self.handlers[lane].steps = []
+                renderer.start()
+
+            if events is None:
+                events = self.stream(ticker)
+
+            for lane, kind, text in events:
+                if kind == 'step':
+                    steps.append(f"[{LANE_TITLES[lane]}] {text}")
+                self.handlers[lane].render_event(renderers[lane], kind, text, f"{LANE_TITLES[lane]} step")
+
+            for renderer in renderers.values():
+                renderer.flush()
+            self.report = renderers[ANALYST_LANE].output_text
+            self.steps = steps
+            return True
+
+        except Exception as e:
+            for renderer in renderers.values():
+                renderer.flush()
+            st.error(f"Error: {str(e)}")
+            return False
+
+
+def lane_renderers(placeholders, timer_placeholder, start_time):
+    return {
+        lane: StreamRenderer(output, steps, timer_placeholder, start_time, steps_height=250 if lane in RESEARCH_LANES else 400)
+        for lane, (output, steps) in placeholders.items()
+    }
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from agent_handler import BedrockAgentHandler
+from analysis_cache import analysis_cache_from_env, normalize_ticker
+from batch_analyze import read_tickers
+
+
+# Spend limit over a rolling window: agent runs started and model tokens used.
+# A run is counted when it starts, its tokens when it finishes, so concurrent
+# runs can overshoot the token limit by at most their own usage.
+class SpendBudget:
+    def __init__(self, max_runs=None, max_tokens=None, window_seconds=86400, clock=time.time):
+        self.max_runs = max_runs
+        self.max_tokens = max_tokens
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.runs = deque()
+        self.tokens = deque()
+        self.lock = threading.Lock()
+
+    def _prune(self, now):
+        for events in (self.runs, self.tokens):
+            while events and now - events[0][0] > self.window_seconds:
+                events.popleft()
+
+    def usage(self):
+        with self.lock:
+            self._prune(self.clock())
+            return {'runs': len(self.runs), 'tokens': sum(tokens for _, tokens in self.tokens)}
+
+    # Reserve one run if the budget allows it
+    def try_start_run(self):
+        with self.lock:
+            now = self.clock()
+            self._prune(now)
+            if self.max_runs is not None and len(self.runs) >= self.max_runs:
+                return False
+            if self.max_tokens is not None and sum(tokens for _, tokens in self.tokens) >= self.max_tokens:
+                return False
+            self.runs.append((now, 1))
+            return True
+
+    # Give back a reserved run that did not invoke the agent
+    def release_run(self):
+        with self.lock:
+            if self.runs:
+                self.runs.pop()
+
+    def record_tokens(self, tokens):
+        with self.lock:
+            self.tokens.append((self.clock(), tokens))
+
+
+# Re-runs the agent pipeline for a hot-ticker list every `interval_seconds`
+# and stores the reports in the analysis cache marked as pre-warmed. Each
+# ticker starts after a random delay of up to `jitter_seconds`, at most
+# `concurrency` run at once, and runs are skipped once the budget is spent.
+# With a SingleFlight, a user asking for a ticker that is being pre-warmed
+# joins that run instead of starting another, and a pre-warm of a ticker a
+# user run is already fetching is skipped without spending budget.
+class Prewarmer:
+    def __init__(self, tickers, cache, interval_seconds=600, jitter_seconds=60, concurrency=2,
+                 budget=None, single_flight=None, stats_path=None, client=None):
+        self.tickers = [normalize_ticker(ticker) for ticker in tickers]
+        self.cache = cache
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.concurrency = concurrency
+        self.budget = budget or SpendBudget()
+        self.single_flight = single_flight
+        self.stats_path = stats_path
+        self.client = client
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+        # Per ticker: runs, failures, budget skips and pre-warms coalesced into a
+        # user run. Serves of pre-warmed reports are counted by the cache and
+        # reported relative to the count when the scheduler started.
+        self.stats = {
+            ticker: {'runs': 0, 'failures': 0, 'skipped_budget': 0, 'coalesced': 0,
+                     'last_run_at': None, 'last_run_seconds': None, 'last_error': None}
+            for ticker in self.tickers
+        }
+        self.served_at_start = {ticker: cache.prewarm_served(ticker) for ticker in self.tickers}
+
+    # Report, steps and profile of one agent run. When a user run for the
+    # ticker is already in flight, that run stores its own report and None is
+    # returned instead.
+    def _run_agent(self, ticker):
+        handler = BedrockAgentHandler(self.client)
+        input_text = f"ticker {ticker}"
+        if self.single_flight is None:
+            result = handler.run(input_text)
+            return result['report'], result['steps'], result['profile']
+
+        flight = self.single_flight.join(ticker, lambda: handler.stream(input_text),
+                                         context={'session_id': handler.session_id})
+        if flight.context['session_id'] != handler.session_id:
+            return None
+        chunks = []
+        steps = []
+        for kind, text in flight.subscribe():
+            if kind == 'chunk':
+                chunks.append(text)
+            else:
+                steps.append(text)
+        return ''.join(chunks), steps, handler.profile
+
+    def warm(self, ticker):
+        if self.stop_event.wait(random.uniform(0, self.jitter_seconds)):
+            return
+        stats = self.stats[ticker]
+        if not self.budget.try_start_run():
+            with self.lock:
+                stats['skipped_budget'] += 1
+            return
+
+        started = time.time()
+        try:
+            result = self._run_agent(ticker)
+        except Exception as e:
+            with self.lock:
+                stats['failures'] += 1
+                stats['last_error'] = str(e)
+            print(f"Pre-warming {ticker} failed: {e}", file=sys.stderr)
+            return
+        if result is None:
+            # Joined a user run, which stores its own report
+            self.budget.release_run()
+            with self.lock:
+                stats['coalesced'] += 1
+            return
+
+        report, steps, profile = result
+        if profile:
+            self.budget.record_tokens(profile['input_tokens'] + profile['output_tokens'])
+
+        with self.lock:
+            stats['runs'] += 1
+            stats['last_run_at'] = started
+            stats['last_run_seconds'] = round(time.time() - started, 3)
+            stats['last_error'] = None
+        if report:
+            self.cache.put(ticker, report, steps, source='prewarm')
+
+    def stats_snapshot(self):
+        with self.lock:
+            snapshot = {ticker: dict(stats) for ticker, stats in self.stats.items()}
+        for ticker, stats in snapshot.items():
+            stats['served'] = self.cache.prewarm_served(ticker) - self.served_at_start[ticker]
+        return {'tickers': snapshot, 'budget': self.budget.usage()}
+
+    def write_stats(self):
+        if not self.stats_path:
+            return
+        with open(self.stats_path + '.tmp', 'w') as f:
+            json.dump(self.stats_snapshot(), f, indent=2)
+        os.replace(self.stats_path + '.tmp', self.stats_path)
+
+    def run_cycle(self):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(self.warm, self.tickers))
+        self.write_stats()
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            started = time.time()
+            self.run_cycle()
+            self.stop_event.wait(max(0.0, self.interval_seconds - (time.time() - started)))
+
+    def start(self):
+        threading.Thread(target=self.run_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def optional_int(value):
+    return int(value) if value else None
+
+
+# Hot tickers from PREWARM_TICKERS (comma separated) or PREWARM_TICKERS_FILE
+def hot_tickers_from_env():
+    if os.environ.get('PREWARM_TICKERS_FILE'):
+        return read_tickers(os.environ['PREWARM_TICKERS_FILE'])
+    return [ticker for ticker in map(normalize_ticker, os.environ.get('PREWARM_TICKERS', '').split(',')) if ticker]
+
+
+# Build the scheduler from PREWARM_* environment variables, or None when no
+# hot tickers are configured
+def prewarmer_from_env(cache, single_flight=None):
+    tickers = hot_tickers_from_env()
+    if not tickers:
+        return None
+    return Prewarmer(
+        tickers,
+        cache,
+        interval_seconds=float(os.environ.get('PREWARM_INTERVAL_SECONDS', '600')),
+        jitter_seconds=float(os.environ.get('PREWARM_JITTER_SECONDS', '60')),
+        concurrency=int(os.environ.get('PREWARM_CONCURRENCY', '2')),
+        budget=SpendBudget(
+            max_runs=optional_int(os.environ.get('PREWARM_MAX_RUNS_PER_DAY')),
+            max_tokens=optional_int(os.environ.get('PREWARM_MAX_TOKENS_PER_DAY'))
+        ),
+        single_flight=single_flight,
+        stats_path=os.environ.get('PREWARM_STATS_PATH') or None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the analysis cache for a hot-ticker list (PREWARM_* settings).")
+    parser.add_argument('--once', action='store_true', help="Run one cycle and exit instead of running on a schedule")
+    args = parser.parse_args()
+
+    prewarmer = prewarmer_from_env(analysis_cache_from_env())
+    if prewarmer is None:
+        print("No hot tickers configured: set PREWARM_TICKERS or PREWARM_TICKERS_FILE", file=sys.stderr)
+        return 1
+
+    try:
+        if args.once:
+            prewarmer.run_cycle()
+        else:
+            prewarmer.run_forever()
+    except KeyboardInterrupt:
+        prewarmer.stop()
+    print(json.dumps(prewarmer.stats_snapshot(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from aws_clients import get_client
+
+ACTIVE_SESSIONS_METRIC = 'ActiveAnalysisSessions'
+
+
+# Number of browser sessions currently streaming an analysis in this process.
+# The peak since the last publish is kept as well, so short bursts between two
+# publishes still reach the autoscaling metric.
+class ActiveSessions:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    @contextmanager
+    def track(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    # Peak since the previous call, then start a new interval at the current count
+    def take_peak(self):
+        with self.lock:
+            peak = self.peak
+            self.peak = self.active
+            return peak
+
+
+# Publishes the active session gauge to CloudWatch every `interval` seconds
+# from a daemon thread. Each task publishes its own data point under the same
+# dimensions, so the Average statistic is the load per task.
+class CloudWatchSessionPublisher:
+    def __init__(self, sessions, namespace, service_name, interval=60):
+        self.sessions = sessions
+        self.namespace = namespace
+        self.service_name = service_name
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def publish(self):
+        get_client('cloudwatch').put_metric_data(
+            Namespace=self.namespace,
+            MetricData=[{
+                'MetricName': ACTIVE_SESSIONS_METRIC,
+                'Dimensions': [{'Name': 'ServiceName', 'Value': self.service_name}],
+                'Value': self.sessions.take_peak(),
+                'Unit': 'Count'
+            }]
+        )
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Failed to publish {ACTIVE_SESSIONS_METRIC}: {e}")
+
+
+# Publisher configured from SESSION_METRICS_NAMESPACE, SESSION_METRICS_SERVICE and
+# SESSION_METRICS_INTERVAL_SECONDS, or None when no namespace is set
+def session_publisher_from_env(sessions):
+    namespace = os.environ.get('SESSION_METRICS_NAMESPACE')
+    if not namespace:
+        return None
+    return CloudWatchSessionPublisher(
+        sessions,
+        namespace,
+        os.environ.get('SESSION_METRICS_SERVICE', 'stock-analysis-app'),
+        float(os.environ.get('SESSION_METRICS_INTERVAL_SECONDS', '60'))
+    ).start()
@@ -0,0 +1,88 @@
+import threading
+
+
+# One in-flight agent run. The producer thread appends every item to `events`;
+# each subscriber replays what was already seen and then follows the live tail.
+class Flight:
+    def __init__(self, key, context=None):
+        self.key = key
+        self.context = context or {}
+        self.events = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+    def publish(self, item):
+        with self.cond:
+            self.events.append(item)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def subscribe(self):
+        with self.cond:
+            self.subscribers += 1
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.events) and not self.done:
+                    self.cond.wait()
+                batch = self.events[index:]
+                index = len(self.events)
+                finished = self.done and index >= len(self.events)
+                error = self.error
+            for item in batch:
+                yield item
+            if finished:
+                if error is not None:
+                    raise error
+                return
+
+
+# Coalesces concurrent identical requests: the first caller for a key starts
+# the producer, later callers join the same flight until it completes.
+class SingleFlight:
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {'leaders': 0, 'followers': 0}
+
+    # Return the flight for `key`, starting `producer()` (an iterable of items)
+    # in a background thread if no run is in progress. The producer runs to
+    # completion even if every subscriber goes away.
+    def join(self, key, producer, context=None):
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.stats['followers'] += 1
+                return flight
+            flight = Flight(key, context)
+            self.flights[key] = flight
+            self.stats['leaders'] += 1
+
+        thread = threading.Thread(target=self._run, args=(flight, producer), daemon=True)
+        thread.start()
+        return flight
+
+    def _run(self, flight, producer):
+        error = None
+        try:
+            for item in producer():
+                flight.publish(item)
+        except Exception as e:
+            error = e
+        finally:
+            # New requests after this point start a fresh run
+            with self.lock:
+                if self.flights.get(flight.key) is flight:
+                    del self.flights[flight.key]
+            flight.finish(error)
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.flights)
@@ -0,0 +1,94 @@
+import os
+import time
+
+
+# Incremental, rate-limited renderer for the steps and results panes.
+#
+# Steps are appended as individual elements inside a scrollable container, so
+# each flush only ships the new fragments to the browser. Output chunks are
+# appended to a buffer and the results pane is redrawn at most flush_hz times
+# per second. The timer has its own, slower cadence.
+class StreamRenderer:
+    def __init__(self, output_placeholder, steps_container, timer_placeholder, start_time,
+                 flush_hz=None, timer_hz=None, steps_height=400):
+        self.output_placeholder = output_placeholder
+        self.steps_container = steps_container
+        self.timer_placeholder = timer_placeholder
+        self.start_time = start_time
+        self.steps_height = steps_height
+
+        flush_hz = flush_hz or float(os.environ.get('UI_FLUSH_HZ', '10'))
+        timer_hz = timer_hz or float(os.environ.get('UI_TIMER_HZ', '2'))
+        self.flush_interval = 1.0 / flush_hz
+        self.timer_interval = 1.0 / timer_hz
+
+        self.steps_box = None
+        self.pending_steps = []
+        self.output_chunks = []
+        self.output_dirty = False
+        self.last_flush = 0.0
+        self.last_timer = 0.0
+
+    @property
+    def output_text(self):
+        return ''.join(self.output_chunks)
+
+    # Show the initial "working" boxes before the first event arrives
+    def start(self):
+        self.steps_container.markdown("""
+        <div class="fixed-height">
+            <div class="step-text">
+                Activating the analysis framework...
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        self.output_placeholder.markdown("""
+        <div class="fixed-height">
+            <div class="step-text">
+                Gathering the insights...
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    def add_step(self, step_html):
+        self.pending_steps.append(step_html)
+
+    def add_chunk(self, text):
+        self.output_chunks.append(text)
+        self.output_dirty = True
+
+    # Called after every stream event; flushes only when the interval is due
+    def tick(self, now=None):
+        now = time.time() if now is None else now
+        if now - self.last_timer >= self.timer_interval:
+            self.update_timer(now)
+        if now - self.last_flush >= self.flush_interval:
+            self.flush(now)
+
+    def update_timer(self, now=None):
+        now = time.time() if now is None else now
+        self.last_timer = now
+        elapsed = now - self.start_time
+        self.timer_placeholder.markdown(f"⏱️ Processing Time: {elapsed:.1f} seconds")
+
+    def flush(self, now=None):
+        self.last_flush = time.time() if now is None else now
+
+        if self.pending_steps:
+            if self.steps_box is None:
+                # Swap the placeholder text for a scrollable box we can append to
+                self.steps_box = self.steps_container.container(height=self.steps_height)
+            for step_html in self.pending_steps:
+                self.steps_box.markdown(step_html, unsafe_allow_html=True)
+            self.pending_steps = []
+
+        if self.output_dirty:
+            self.output_placeholder.markdown(f"""
+            <div class="fixed-height">
+                <div class="step-text">
+                    {self.output_text}
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            self.output_dirty = False
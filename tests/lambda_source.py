@@ -0,0 +1,21 @@
+import os
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Load the inline ZipFile code of a CloudFormation template as a module
+def load_lambda_module(template, name):
+    with open(os.path.join(REPO_ROOT, template)) as f:
+        lines = f.read().split("\n")
+    start = next(i for i, line in enumerate(lines) if line.strip() == "ZipFile: |") + 1
+    indent = len(lines[start]) - len(lines[start].lstrip())
+    end = start
+    while end < len(lines) and (not lines[end].strip() or len(lines[end]) - len(lines[end].lstrip()) >= indent):
+        end += 1
+    source = "\n".join(line[indent:] for line in lines[start:end])
+
+    module = types.ModuleType(name)
+    module.__file__ = template
+    exec(compile(source, template, "exec"), module.__dict__)
+    return module
@@ -0,0 +1,69 @@
+import pytest
+
+from agent_sessions import AgentSessions, ask_follow_up, seeded_session, session_info
+from fake_bedrock import FakeAgentRuntimeClient
+
+ANSWER = [{"chunk": {"bytes": "The dividend is unchanged."}}]
+
+
+class FailingClient:
+    def __init__(self):
+        self.calls = []
+
+    def invoke_agent(self, **kwargs):
+        self.calls.append(kwargs)
+        raise RuntimeError("stream broke")
+
+
+class Handler:
+    session_id = "run-session"
+    agent_id = "AGENT"
+    agent_alias_id = "ALIAS"
+
+
+def ask(sessions, session, client, question="What about the dividend?"):
+    return list(ask_follow_up(sessions, session["session_id"], "AAPL", question, client=client))
+
+
+# Reports not run in this browser session get a fresh session that starts
+# from the report instead of the conversation that produced it
+def test_seeded_session_sends_the_report_with_the_first_question_only():
+    sessions = AgentSessions()
+    session = sessions.register(seeded_session("AAPL report", "AGENT", "ALIAS"))
+    client = FakeAgentRuntimeClient(ANSWER)
+
+    assert ask(sessions, session, client) == [("chunk", "The dividend is unchanged.")]
+    ask(sessions, session, client, "And the margins?")
+
+    assert [call["sessionId"] for call in client.calls] == [session["session_id"]] * 2
+    assert "AAPL report" in client.calls[0]["inputText"]
+    assert "AAPL report" not in client.calls[1]["inputText"]
+
+
+def test_seeded_sessions_are_not_shared():
+    assert seeded_session("report")["session_id"] != seeded_session("report")["session_id"]
+
+
+def test_report_is_sent_again_after_a_failed_first_question():
+    sessions = AgentSessions()
+    session = sessions.register(seeded_session("AAPL report", "AGENT", "ALIAS"))
+    with pytest.raises(RuntimeError):
+        ask(sessions, session, FailingClient())
+    assert session["turns"] == 0
+
+    client = FakeAgentRuntimeClient(ANSWER)
+    ask(sessions, session, client)
+    assert "AAPL report" in client.calls[0]["inputText"]
+    assert session["turns"] == 1
+
+
+# The browser session that ran the analysis continues its own conversation
+def test_run_session_continues_without_the_report():
+    sessions = AgentSessions()
+    session = sessions.register(session_info(Handler()))
+    client = FakeAgentRuntimeClient(ANSWER)
+
+    ask(sessions, session, client)
+
+    assert client.calls[0]["sessionId"] == "run-session"
+    assert client.calls[0]["inputText"] == "Follow-up question about the analysis of ticker AAPL: What about the dividend?"
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+
+import pytest
+from starlette.testclient import TestClient
+
+import api_server
+from fake_bedrock import FakeAgentRuntimeClient, load_recording
+from tests.lambda_source import REPO_ROOT
+from ticker_index import TickerIndex
+
+RECORDING = os.path.join(REPO_ROOT, "recordings", "AAPL.json")
+
+
+# Split a text/event-stream body into (event, data) pairs
+def sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+# FakeAgentRuntimeClient that records how many completion streams are open at once
+class CountingClient(FakeAgentRuntimeClient):
+    def __init__(self, events, delay):
+        super().__init__(events, delay=delay)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def invoke_agent(self, **kwargs):
+        response = super().invoke_agent(**kwargs)
+        response["completion"] = self._counted(response["completion"])
+        return response
+
+    def _counted(self, completion):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            yield from completion
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def create_app(client, max_concurrent=None):
+    app = api_server.create_app(client=client, max_concurrent=max_concurrent)
+    app.state.ticker_index = TickerIndex(["AAPL", "MSFT", "NVDA"], ["Apple Inc.", "Microsoft Corporation", "NVIDIA Corporation"])
+    return app
+
+
+@pytest.fixture
+def client():
+    app = create_app(FakeAgentRuntimeClient(load_recording(RECORDING), delay=0))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_analyze_streams_server_sent_events(client):
+    response = client.post("/analyze/aapl")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "start" and kinds[-1] == "done"
+    assert events[0][1]["ticker"] == "AAPL"
+    assert "step" in kinds and "chunk" in kinds
+
+    # The done event carries the whole report and the step count
+    done = events[-1][1]
+    assert done["report"] == "".join(data["text"] for kind, data in events if kind == "chunk")
+    assert done["steps"] == kinds.count("step")
+    assert [data["step"] for kind, data in events if kind == "step"] == list(range(1, done["steps"] + 1))
+
+
+def test_unknown_ticker_is_rejected_with_suggestions(client):
+    response = client.post("/analyze/APPL")
+
+    assert response.status_code == 400
+    assert response.json()["suggestions"][0] == "AAPL"
+
+
+def test_malformed_ticker_is_rejected(client):
+    response = client.post("/analyze/NOT-A-TICKER")
+
+    assert response.status_code == 400
+    assert response.json()["suggestions"] == []
+
+
+def test_tickers_autocomplete(client):
+    assert client.get("/tickers", params={"prefix": "m"}).json() == {
+        "tickers": [{"symbol": "MSFT", "name": "Microsoft Corporation"}]
+    }
+
+
+# Runs for different tickers beyond the limit wait for a slot
+@pytest.mark.parametrize("max_concurrent", [1, 3])
+def test_concurrent_analyses_are_limited(max_concurrent):
+    agent = CountingClient(load_recording(RECORDING)[:10], delay=0.02)
+    statuses = []
+
+    with TestClient(create_app(agent, max_concurrent)) as client:
+        def analyze(ticker):
+            response = client.post(f"/analyze/{ticker}")
+            statuses.append((response.status_code, sse_events(response.text)[-1][0]))
+
+        threads = [threading.Thread(target=analyze, args=(ticker,)) for ticker in ("AAPL", "MSFT", "NVDA")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert statuses == [(200, "done")] * 3
+    assert agent.max_active == max_concurrent
@@ -0,0 +1,52 @@
+import pytest
+from botocore.exceptions import ClientError, EventStreamError
+
+import batch_analyze
+
+
+def client_error(code, error_class=ClientError):
+    return error_class({"Error": {"Code": code, "Message": "Rate exceeded"}}, "InvokeAgent")
+
+
+@pytest.mark.parametrize("code", [
+    "ThrottlingException",
+    "ServiceQuotaExceededException",
+    "throttlingException",
+    "serviceQuotaExceededException",
+])
+def test_throttling_codes_are_retried(code):
+    assert batch_analyze.is_throttling_error(client_error(code))
+
+
+# Throttling while the completion is streaming arrives as an event stream error
+@pytest.mark.parametrize("code", ["throttlingException", "serviceQuotaExceededException"])
+def test_mid_stream_throttling_is_retried(code):
+    assert batch_analyze.is_throttling_error(client_error(code, EventStreamError))
+
+
+def test_other_errors_are_not_retried():
+    assert not batch_analyze.is_throttling_error(client_error("validationException", EventStreamError))
+    assert not batch_analyze.is_throttling_error(client_error("AccessDeniedException"))
+    assert not batch_analyze.is_throttling_error(ValueError("boom"))
+
+
+# A run throttled mid-stream backs off and succeeds on the next attempt
+def test_analyze_ticker_backs_off_on_mid_stream_throttling(monkeypatch):
+    attempts = []
+
+    class Handler:
+        def run(self, input_text):
+            attempts.append(input_text)
+            if len(attempts) == 1:
+                raise client_error("throttlingException", EventStreamError)
+            return {"report": "report", "steps": [], "session_id": "session"}
+
+    sleeps = []
+    monkeypatch.setattr(batch_analyze, "BedrockAgentHandler", Handler)
+    monkeypatch.setattr(batch_analyze.time, "sleep", sleeps.append)
+
+    record = batch_analyze.analyze_ticker("AAPL", max_attempts=3, base_delay=1, max_delay=10)
+
+    assert record["status"] == "ok"
+    assert record["attempts"] == 2
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 2
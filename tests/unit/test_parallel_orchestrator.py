@@ -0,0 +1,58 @@
+import streamlit as st
+
+import parallel_orchestrator
+from create_bedrock_agents import COLLABORATOR_ENV_PREFIXES, agent_definitions
+from fake_bedrock import FakeAgentRuntimeClient
+from parallel_orchestrator import ANALYST_LANE, ParallelOrchestrator, lane_renderers
+
+
+def agent_run(name):
+    return [
+        {"trace": {"trace": {"orchestrationTrace": {"rationale": {"traceId": name, "text": f"{name} reasoning"}}}}},
+        {"chunk": {"bytes": f"{name} result"}},
+    ]
+
+
+# One recorded run per collaborator, picked by the agentId of the call
+class CollaboratorClient:
+    def invoke_agent(self, **kwargs):
+        return FakeAgentRuntimeClient(agent_run(kwargs["agentId"])).invoke_agent(**kwargs)
+
+
+class Placeholder:
+    def __init__(self):
+        self.bodies = []
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.bodies.append(body)
+
+    def container(self, height=None, border=None):
+        return self
+
+
+def test_collaborators_are_provisioned_agents():
+    names = {agent["agent_name"] for agent in agent_definitions("us-east-1", "123456789012")}
+    assert set(COLLABORATOR_ENV_PREFIXES) <= names
+
+
+def test_invoke_renders_each_lane_through_its_handler(monkeypatch):
+    for name, prefix in COLLABORATOR_ENV_PREFIXES.items():
+        monkeypatch.setenv(f"{prefix}_AGENT_ID", name)
+        monkeypatch.setenv(f"{prefix}_AGENT_ALIAS_ID", f"{name}-alias")
+    assert parallel_orchestrator.parallel_mode_available()
+
+    st.session_state.analysis_steps = []
+    orchestrator = ParallelOrchestrator(client=CollaboratorClient())
+    placeholders = {lane: (Placeholder(), Placeholder()) for lane in COLLABORATOR_ENV_PREFIXES}
+
+    assert orchestrator.invoke("AAPL", lane_renderers(placeholders, Placeholder(), 0.0))
+
+    assert orchestrator.report == "analyst_agent result"
+    assert sorted(orchestrator.steps) == [
+        "[Analysis] analyst_agent reasoning", "[News] news_agent reasoning", "[Stock Data] stock_data_agent reasoning"
+    ]
+    steps_html = "".join(st.session_state.analysis_steps)
+    for label in ("News step 1:", "Stock Data step 1:", "Analysis step 1:"):
+        assert label in steps_html
+    assert orchestrator.handlers[ANALYST_LANE].steps == ["analyst_agent reasoning"]
+    assert "analyst_agent result" in placeholders[ANALYST_LANE][0].bodies[-1]
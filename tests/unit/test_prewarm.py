@@ -0,0 +1,73 @@
+import os
+import threading
+
+import pytest
+
+from analysis_cache import AnalysisCache
+from fake_bedrock import FakeAgentRuntimeClient, load_recording
+from prewarm import Prewarmer, SpendBudget
+from single_flight import SingleFlight
+from tests.lambda_source import REPO_ROOT
+
+RECORDING = os.path.join(REPO_ROOT, "recordings", "AAPL.json")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "sqlite":
+        return AnalysisCache(sqlite_path=str(tmp_path / "analysis_cache.db"))
+    return AnalysisCache()
+
+
+def prewarmer(cache, tickers, **kwargs):
+    client = FakeAgentRuntimeClient(load_recording(RECORDING))
+    return Prewarmer(tickers, cache, jitter_seconds=0, client=client, **kwargs)
+
+
+# A pre-warm that joins a user run already in flight does not use up the budget
+def test_coalesced_prewarm_does_not_spend_a_run(cache):
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def user_run():
+        release.wait(5)
+        yield "chunk", "user report"
+
+    flight = single_flight.join("AAPL", user_run, context={"session_id": "user-session"})
+    budget = SpendBudget(max_runs=1)
+    scheduler = prewarmer(cache, ["AAPL", "MSFT"], budget=budget, single_flight=single_flight)
+
+    scheduler.warm("AAPL")
+    release.set()
+    list(flight.subscribe())
+
+    stats = scheduler.stats_snapshot()["tickers"]
+    assert stats["AAPL"]["coalesced"] == 1 and stats["AAPL"]["runs"] == 0
+    assert budget.usage()["runs"] == 0
+
+    # The run is still available for a ticker nobody is fetching
+    scheduler.warm("MSFT")
+    assert scheduler.stats_snapshot()["tickers"]["MSFT"]["runs"] == 1
+    assert cache.get("MSFT")["source"] == "prewarm"
+
+
+# Serves of a pre-warmed report count even after a user run replaces it
+def test_serves_survive_a_user_run_replacing_the_entry(cache):
+    scheduler = prewarmer(cache, ["AAPL"])
+    scheduler.warm("AAPL")
+
+    prewarmed = cache.get("AAPL")
+    cache.record_served(prewarmed)
+    cache.record_served(prewarmed)
+    user_entry = cache.put("AAPL", "user report", [], source="user")
+    cache.record_served(user_entry)
+
+    assert scheduler.stats_snapshot()["tickers"]["AAPL"]["served"] == 2
+
+
+def test_serves_before_the_scheduler_started_are_not_counted(cache):
+    cache.record_served(cache.put("AAPL", "old report", [], source="prewarm"))
+
+    scheduler = prewarmer(cache, ["AAPL"])
+
+    assert scheduler.stats_snapshot()["tickers"]["AAPL"]["served"] == 0
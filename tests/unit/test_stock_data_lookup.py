@@ -0,0 +1,168 @@
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.lambda_source import load_lambda_module
+
+EXCHANGE_TZ = "America/New_York"
+
+
+# Stand-in for yfinance serving a constant price up to `as_of`, optionally with
+# a split. Like the real library, bars are auto-adjusted as of the fetch (bars
+# before a split that has happened are divided by its ratio), Ticker.history
+# returns tz-aware bars and download tz-naive ones. Symbols in `unlisted`
+# have no bars.
+class FakeMarket:
+    def __init__(self, as_of):
+        self.as_of = pd.Timestamp(as_of)
+        self.unlisted = set()
+        self.split_on = None
+        self.split_ratio = 4.0
+        self.calls = []
+
+    def bars(self, start=None, period=None):
+        first = pd.Timestamp(start) if start else self.as_of - pd.DateOffset(years=1)
+        index = pd.bdate_range(first, self.as_of, name="Date")
+        close = np.full(len(index), 100.0)
+        splits = np.zeros(len(index))
+        if self.split_on is not None and self.split_on <= self.as_of:
+            # Raw closes drop from 100 to 25 on the split; adjusted, they are all 25
+            close = close / self.split_ratio
+            splits[index == self.split_on] = self.split_ratio
+        return pd.DataFrame({
+            "Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+            "Volume": np.full(len(index), 1000), "Dividends": 0.0, "Stock Splits": splits,
+        }, index=index)
+
+    def module(self):
+        market = self
+
+        class Ticker:
+            def __init__(self, symbol):
+                self.symbol = symbol
+
+            def history(self, period=None, start=None, interval="1d", **kwargs):
+                market.calls.append(("history", self.symbol, period, start))
+                if self.symbol in market.unlisted:
+                    return pd.DataFrame()
+                return market.bars(start, period).tz_localize(EXCHANGE_TZ)
+
+        def download(symbols, period=None, start=None, group_by="ticker", **kwargs):
+            market.calls.append(("download", tuple(symbols), period, start))
+            listed = [symbol for symbol in symbols if symbol not in market.unlisted]
+            if not listed:
+                return pd.DataFrame()
+            return pd.concat({symbol: market.bars(start, period) for symbol in listed}, axis=1)
+
+        return types.SimpleNamespace(Ticker=Ticker, download=download)
+
+
+@pytest.fixture
+def market(monkeypatch):
+    market = FakeMarket("2026-10-09")
+    monkeypatch.setitem(sys.modules, "yfinance", market.module())
+    return market
+
+
+# A fresh copy of the Lambda whose cache is always stale, so every lookup
+# after the first merges a delta into the cached bars
+@pytest.fixture
+def stock(market, tmp_path):
+    module = load_lambda_module("Stock_Data_Lookup.yaml", "stock_data_lookup")
+    module.PRICE_CACHE_DIR = str(tmp_path)
+    module.PRICE_CACHE_FRESH_SECONDS = -1
+    module.load_data_libraries()
+    return module
+
+
+def test_single_lookup_then_batch_refresh(stock, market):
+    stock.load_price_history("AAPL")
+    market.as_of += pd.offsets.BDay(3)
+
+    hist, status = stock.load_price_histories(["AAPL"])["AAPL"]
+
+    assert status == "delta"
+    assert hist.index.tz is None
+    assert hist.index[-1] == market.as_of
+    assert hist.index.is_monotonic_increasing and not hist.index.has_duplicates
+
+
+def test_batch_lookup_then_single_refresh(stock, market):
+    stock.load_price_histories(["AAPL", "MSFT"])
+    market.as_of += pd.offsets.BDay(3)
+
+    hist, status = stock.load_price_history("MSFT")
+
+    assert status == "delta"
+    assert hist.index.tz is None
+    assert hist.index[-1] == market.as_of
+    assert hist.index.is_monotonic_increasing and not hist.index.has_duplicates
+
+
+# Bars pickled with a tz-aware index before the cache was normalized still merge
+def test_tz_aware_disk_cache_is_normalized(stock, market):
+    stock._write_cache("AAPL", {"hist": market.bars(), "fetched_at": 0})
+    stock._price_cache.clear()
+    pd.to_pickle({"hist": market.bars().tz_localize(EXCHANGE_TZ), "fetched_at": 0}, stock._cache_path("AAPL"))
+    market.as_of += pd.offsets.BDay(1)
+
+    hist, status = stock.load_price_histories(["AAPL"])["AAPL"]
+
+    assert status == "delta"
+    assert hist.index.tz is None
+
+
+# A split inside the delta window re-adjusts the whole year, so the cached
+# prefix must not be kept
+@pytest.mark.parametrize("batched", [False, True])
+def test_split_in_delta_refetches_the_year(stock, market, batched):
+    stock.load_price_history("AAPL")
+    market.split_on = market.as_of + pd.offsets.BDay(2)
+    market.as_of += pd.offsets.BDay(3)
+
+    if batched:
+        hist, status = stock.load_price_histories(["AAPL"])["AAPL"]
+    else:
+        hist, status = stock.load_price_history("AAPL")
+
+    assert status == "refetch"
+    assert hist["Close"].nunique() == 1
+    summary = stock.summarize_history("AAPL", hist)
+    assert summary["max_drawdown"]["1y"] == 0
+
+
+# An action the cached bars already include is not a reason to refetch
+def test_known_split_merges_the_delta(stock, market):
+    market.split_on = market.as_of
+    stock.load_price_history("AAPL")
+    market.as_of += pd.offsets.BDay(2)
+
+    hist, status = stock.load_price_history("AAPL")
+
+    assert status == "delta"
+    assert hist["Close"].nunique() == 1
+
+
+def lookup_event(**parameters):
+    return {
+        "agent": {}, "actionGroup": "StockData", "function": "stock_data_lookup", "messageVersion": "1.0",
+        "parameters": [{"name": name, "value": value} for name, value in parameters.items()],
+    }
+
+
+# A comparison where no symbol has data answers with the missing symbols
+# instead of failing the whole call
+@pytest.mark.parametrize("period", [None, "2y"])
+def test_compare_with_no_data(stock, market, period):
+    market.unlisted = {"ZZZZ", "YYYY"}
+    parameters = {"tickers": "[ZZZZ, YYYY]"}
+    if period:
+        parameters["period"] = period
+
+    response = stock.lambda_handler(lookup_event(**parameters), None)
+
+    body = response["response"]["functionResponse"]["responseBody"]["TEXT"]["body"]
+    assert '"missing":["ZZZZ","YYYY"]' in body
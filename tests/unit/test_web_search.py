@@ -0,0 +1,23 @@
+import pytest
+
+from tests.lambda_source import load_lambda_module
+
+
+@pytest.fixture(scope="module")
+def web_search():
+    return load_lambda_module("Web_Search.yaml", "web_search")
+
+
+def test_content_words_stay_in_the_cache_key(web_search):
+    price = web_search.search_cache_key("AAPL stock price", "", "news", 7)
+    news = web_search.search_cache_key("AAPL latest news", "", "news", 7)
+    assert price != news
+
+
+def test_word_order_is_kept(web_search):
+    assert web_search.normalize_query("Apple beats Samsung") != web_search.normalize_query("Samsung beats Apple")
+
+
+def test_case_punctuation_and_filler_words_are_normalized(web_search):
+    assert web_search.normalize_query("The  AAPL stock-price, for TODAY?") == "aapl stock price today"
+    assert web_search.normalize_query("the of") == "the of"
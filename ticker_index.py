@@ -0,0 +1,145 @@
+import os
+import re
+import sys
+import threading
+from bisect import bisect_left
+
+# Exchange symbols: 1-5 letters, optionally a class suffix such as BRK.B
+TICKER_PATTERN = re.compile(r'^[A-Z]{1,5}(\.[A-Z]{1,2})?$')
+
+# Built by build_ticker_index.py: one "SYMBOL<TAB>Security name" line per
+# listed symbol, sorted by symbol
+TICKER_INDEX_PATH = os.environ.get(
+    'TICKER_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ticker_index.tsv'))
+
+
+# Uppercase and accept the other class-share separators (BRK-B, BRK/B)
+def normalize_symbol(ticker):
+    return re.sub(r'[-/]', '.', ticker.strip().upper())
+
+
+def is_ticker_format(ticker):
+    return bool(TICKER_PATTERN.match(ticker))
+
+
+# Edit distance counting an adjacent transposition (APPL -> AAPL) as one edit
+def edit_distance(a, b):
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def deletes(symbol):
+    return {symbol[:i] + symbol[i + 1:] for i in range(len(symbol))}
+
+
+# The listed symbols as two parallel sorted arrays: O(log n) exact lookup with
+# bisect, prefix completion from the insertion point, and "did you mean"
+# suggestions from a single-deletion index (built on first use) that finds
+# every symbol within one insert, delete, substitution or transposition.
+class TickerIndex:
+    def __init__(self, symbols, names):
+        self.symbols = symbols
+        self.names = names
+        self.lock = threading.Lock()
+        self.deletion_index = None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return self.name(symbol) is not None
+
+    # Security name of a listed symbol, or None
+    def name(self, symbol):
+        i = bisect_left(self.symbols, symbol)
+        if i < len(self.symbols) and self.symbols[i] == symbol:
+            return self.names[i]
+        return None
+
+    # Listed symbols starting with `prefix`, in symbol order
+    def complete(self, prefix, limit=10):
+        matches = []
+        i = bisect_left(self.symbols, prefix)
+        while i < len(self.symbols) and self.symbols[i].startswith(prefix) and len(matches) < limit:
+            matches.append(self.symbols[i])
+            i += 1
+        return matches
+
+    def _deletion_index(self):
+        with self.lock:
+            if self.deletion_index is None:
+                index = {}
+                for symbol in self.symbols:
+                    for key in deletes(symbol) | {symbol}:
+                        index.setdefault(key, []).append(symbol)
+                self.deletion_index = index
+            return self.deletion_index
+
+    # Listed symbols one edit away from `symbol`, closest first
+    def fuzzy(self, symbol, limit=5):
+        index = self._deletion_index()
+        candidates = set()
+        for key in deletes(symbol) | {symbol}:
+            candidates.update(index.get(key, ()))
+        ranked = sorted(
+            (edit_distance(symbol, candidate), abs(len(candidate) - len(symbol)), candidate)
+            for candidate in candidates if candidate != symbol
+        )
+        return [candidate for distance, _, candidate in ranked if distance <= 1][:limit]
+
+    # "Did you mean" candidates for an unknown symbol: near misses first, then
+    # completions of what was typed
+    def suggest(self, symbol, limit=5):
+        suggestions = self.fuzzy(symbol, limit)
+        for candidate in self.complete(symbol, limit):
+            if candidate not in suggestions and candidate != symbol:
+                suggestions.append(candidate)
+        return suggestions[:limit]
+
+
+def read_ticker_index(path):
+    rows = []
+    with open(path) as f:
+        for line in f:
+            symbol, _, name = line.rstrip('\n').partition('\t')
+            if symbol:
+                rows.append((symbol, name))
+    rows.sort()
+    return TickerIndex([symbol for symbol, _ in rows], [name for _, name in rows])
+
+
+# The packaged index, or None when it has not been built; callers then fall
+# back to checking the symbol format only
+def load_ticker_index(path=None):
+    path = path or TICKER_INDEX_PATH
+    try:
+        return read_ticker_index(path)
+    except FileNotFoundError:
+        print(f"Ticker index {path} not found; only the ticker format will be checked "
+              f"(build it with build_ticker_index.py)", file=sys.stderr)
+        return None
+
+
+# Validate a ticker before any agent is invoked. Returns (symbol, error,
+# suggestions): the normalized symbol, and an error message with "did you
+# mean" suggestions when it is malformed or not listed.
+def check_ticker(ticker, index=None):
+    symbol = normalize_symbol(ticker or '')
+    if not is_ticker_format(symbol):
+        return symbol, "Invalid ticker symbol. Please enter 1-5 letters, optionally with a class suffix such as BRK.B.", []
+    if index is not None and symbol not in index:
+        return symbol, f"Unknown ticker symbol {symbol}.", index.suggest(symbol)
+    return symbol, None, []
+
+
+def is_valid_ticker(ticker, index=None):
+    return check_ticker(ticker, index)[1] is None
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUPERVISOR = 'supervisor'
+
+# Trace parts that can carry model invocations
+TRACE_PARTS = ['preProcessingTrace', 'orchestrationTrace', 'postProcessingTrace', 'routingClassifierTrace']
+
+# Histogram buckets (seconds) for span and run durations
+BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+
+
+# Turns one run's raw completion events into a timeline of spans: each
+# collaborator call, each action-group Lambda call and each model invocation,
+# with input/output token counts. Times are seconds since the run started.
+class TraceProfiler:
+    def __init__(self, run_id, clock=time.monotonic):
+        self.run_id = run_id
+        self.clock = clock
+        self.start = clock()
+        self.end = None
+        self.first_chunk = None
+        self.first_step = None
+        self.spans = []
+        self.open_spans = {}
+
+    def now(self):
+        return round(self.clock() - self.start, 4)
+
+    def _open(self, key, kind, name, agent):
+        span = {'kind': kind, 'name': name, 'agent': agent, 'start': self.now(), 'end': None,
+                'duration': None, 'input_tokens': None, 'output_tokens': None}
+        self.open_spans[key] = span
+        self.spans.append(span)
+        return span
+
+    def _close(self, key):
+        span = self.open_spans.pop(key, None)
+        if span is not None:
+            span['end'] = self.now()
+            span['duration'] = round(span['end'] - span['start'], 4)
+        return span
+
+    # Feed every raw event from response['completion'] through here
+    def observe(self, event):
+        if 'chunk' in event:
+            if self.first_chunk is None:
+                self.first_chunk = self.now()
+            return
+        trace = event.get('trace')
+        if not trace or 'trace' not in trace:
+            return
+        agent = trace.get('collaboratorName') or SUPERVISOR
+        for part in TRACE_PARTS:
+            if part in trace['trace']:
+                self._observe_part(agent, trace['trace'][part])
+
+    def _observe_part(self, agent, part):
+        if 'modelInvocationInput' in part:
+            model_input = part['modelInvocationInput']
+            self._open(('model', model_input.get('traceId')), 'model', model_input.get('type', 'model'), agent)
+
+        if 'modelInvocationOutput' in part:
+            model_output = part['modelInvocationOutput']
+            span = self._close(('model', model_output.get('traceId')))
+            usage = model_output.get('metadata', {}).get('usage', {})
+            if span is not None:
+                span['input_tokens'] = usage.get('inputTokens')
+                span['output_tokens'] = usage.get('outputTokens')
+
+        if 'rationale' in part and self.first_step is None:
+            self.first_step = self.now()
+
+        if 'invocationInput' in part:
+            invocation = part['invocationInput']
+            if 'agentCollaboratorInvocationInput' in invocation:
+                name = invocation['agentCollaboratorInvocationInput'].get('agentCollaboratorName')
+                self._open(('collaborator', name), 'collaborator', name, agent)
+            elif 'actionGroupInvocationInput' in invocation:
+                action = invocation['actionGroupInvocationInput']
+                name = action.get('function') or action.get('actionGroupName')
+                self._open(('action_group', agent), 'action_group', name, agent)
+
+        if 'observation' in part:
+            observation = part['observation']
+            if 'agentCollaboratorInvocationOutput' in observation:
+                name = observation['agentCollaboratorInvocationOutput'].get('agentCollaboratorName')
+                self._close(('collaborator', name))
+            elif 'actionGroupInvocationOutput' in observation:
+                self._close(('action_group', agent))
+
+    def finish(self):
+        self.end = self.now()
+        # Anything still open was cut short by the end of the stream
+        for key in list(self.open_spans):
+            self._close(key)
+        return self.profile()
+
+    # Per-run JSON profile: timeline plus totals per collaborator, action group and agent model
+    def profile(self):
+        totals = {}
+        input_tokens = 0
+        output_tokens = 0
+        for span in self.spans:
+            key = (span['kind'], span['agent'], span['name'])
+            entry = totals.setdefault(key, {'kind': span['kind'], 'name': span['name'], 'agent': span['agent'],
+                                            'count': 0, 'seconds': 0.0, 'input_tokens': 0, 'output_tokens': 0})
+            entry['count'] += 1
+            entry['seconds'] = round(entry['seconds'] + (span['duration'] or 0), 4)
+            entry['input_tokens'] += span['input_tokens'] or 0
+            entry['output_tokens'] += span['output_tokens'] or 0
+            input_tokens += span['input_tokens'] or 0
+            output_tokens += span['output_tokens'] or 0
+
+        return {
+            'run_id': self.run_id,
+            'total_seconds': self.end if self.end is not None else self.now(),
+            'time_to_first_step': self.first_step,
+            'time_to_first_chunk': self.first_chunk,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'totals': sorted(totals.values(), key=lambda entry: -entry['seconds']),
+            'spans': self.spans
+        }
+
+
+# Process-wide aggregate of finished run profiles, rendered in the Prometheus
+# text exposition format
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def _observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+    def _increment(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def record(self, profile):
+        with self.lock:
+            self._increment('agent_runs_total', {})
+            self._observe('agent_run_seconds', {}, profile['total_seconds'])
+            if profile['time_to_first_chunk'] is not None:
+                self._observe('agent_time_to_first_chunk_seconds', {}, profile['time_to_first_chunk'])
+            for span in profile['spans']:
+                labels = {'kind': span['kind'], 'name': span['name'] or '', 'agent': span['agent']}
+                if span['duration'] is not None:
+                    self._observe('agent_span_seconds', labels, span['duration'])
+                if span['kind'] == 'model':
+                    self._increment('agent_model_tokens_total', {'agent': span['agent'], 'direction': 'input'},
+                                    span['input_tokens'] or 0)
+                    self._increment('agent_model_tokens_total', {'agent': span['agent'], 'direction': 'output'},
+                                    span['output_tokens'] or 0)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name in sorted({key[0] for key in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+            for name in sorted({key[0] for key in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(BUCKETS, histogram['buckets']):
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {round(histogram['sum'], 4)}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+# Shared registry for this process
+registry = MetricsRegistry()
+
+
+# Record a finished profile and, if AGENT_PROFILE_DIR is set, write it as JSON
+def publish_profile(profile):
+    registry.record(profile)
+    profile_dir = os.environ.get('AGENT_PROFILE_DIR')
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        with open(os.path.join(profile_dir, f"{profile['run_id']}.json"), 'w') as f:
+            json.dump(profile, f, indent=2)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Serve /metrics from a background thread (used by the Streamlit app, which
+# cannot add routes of its own)
+def start_metrics_server(port):
+    server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server